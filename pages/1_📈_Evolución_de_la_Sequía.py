@@ -20,11 +20,12 @@ import pandas as pd
 import json
 # Treemap visualization
 import plotly.express as px # Interactive
-# To make spatial data
-import geopandas as gpd
 
-import duckdb
-from huggingface_hub import hf_hub_url
+from utils.cache import show_cache_stats
+from utils.data import DATASETS, shared_dataset
+from utils.figures import build_many, cached_figure
+
+DROUGHT_FILE = DATASETS["drought"]["filename"]
 
 # Configure warnings to keep the output clean.
 warnings.filterwarnings("ignore")
@@ -33,27 +34,6 @@ warnings.filterwarnings("ignore")
 # Functions
 # ------------------------------------------------------------------------------
 
-# Cache the connection (resource-level)
-@st.cache_resource
-def get_con():
-    con = duckdb.connect()
-    con.execute("INSTALL httpfs; LOAD httpfs;")
-    return con
-
-# Cache the data (data-level)
-@st.cache_data(ttl=6*3600, show_spinner="Cargando datos de sequía…")
-def load_datasets(repo_id: str, filename: str, revision: str = "main"):
-    # Build a stable CDN URL (supports HTTP range properly)
-    url = hf_hub_url(
-        repo_id=repo_id,
-        filename=filename,
-        repo_type="dataset",
-        revision=revision,
-    )
-    con = get_con()
-    # Use parameter binding so the SQL text stays stable for caching
-    return con.execute("SELECT * FROM read_parquet($url)", {"url": url}).df()
-        
 def plot_static_map(df, title, show=True, write=False, file_name=None) : 
     # Define your color mapping
     color_discrete_map = {
@@ -86,61 +66,18 @@ def plot_static_map(df, title, show=True, write=False, file_name=None) :
     )
     return fig
 
-# ------------------------------------------------------------------------------
-# LOADING DATA
-# ------------------------------------------------------------------------------
-
-dataDrought = load_datasets(
-    repo_id="danielmlvz/water-dashboard",
-    filename="drought/part-0.parquet",
-    revision="main",
-)
-
-# Data Drought adjustments for a geopandas df
-dataDrought["geometry"] = gpd.GeoSeries.from_wkt(dataDrought["geometry"])
-dataDrought = gpd.GeoDataFrame(dataDrought, geometry="geometry")
-dataDrought = dataDrought.set_crs(epsg=4326, inplace=True)
-
-# ------------------------------------------------------------------------------
-# PAGE INFORMATION
-# ------------------------------------------------------------------------------
-
-st.set_page_config(
-    layout="wide",
-    page_title="Dashboard : Futuro del Agua en CDMX",
-    page_icon="🚰",  
-    initial_sidebar_state="expanded"
-    )
-
-# Main page content
-st.markdown("# Sequía en la Ciudad de México")
-st.sidebar.markdown("# Time series y Mapas de Sequía/Escasez")
-
-t1, t2 = st.tabs([
-    "🌵 Evolución Sequía",
-    "🏞️ Niveles del Cutzamala"
-    ])
-
-# ----------------------------------------
-#  TAB2 : Evolucion de Sequia
-# ----------------------------------------
-
-with t1 : 
-
-    selected_range = st.slider(
-    "Selecciona un rango de años",
-    min_value=2003,
-    max_value=2003,
-    value=(2003, 2023)  # Initial lower and upper bounds
-    )
+@cached_figure("sequia", "serie", sources=(DROUGHT_FILE,))
+def drought_series(year_min: int, year_max: int, revision: str = "main"):
+    """Monthly mean drought level of the city between two years."""
+    dataDrought = shared_dataset("drought", revision)
 
     # Aggregate data
     t = dataDrought.groupby(by=['DATE',
                                 'MONTH',
                                 'YEAR'])['VALUE_1'].mean().reset_index()
-            
+
     t['DATE'] = pd.to_datetime(t['DATE'])        
-    t_filtered = t[(t['YEAR']>=selected_range[0])&(t['YEAR'] <= selected_range[1])]
+    t_filtered = t[(t['YEAR']>=year_min)&(t['YEAR'] <= year_max)]
 
     # Create Plotly line plot
     fig1 = px.line(
@@ -184,15 +121,59 @@ with t1 :
         bgcolor="white",
         opacity=1
     )
-        
+
     fig1.update_layout(
         width=2400,
         height=500,
         template='plotly_white',
     )
+    return fig1
+
+@cached_figure("sequia", "mapa", sources=(DROUGHT_FILE,), max_entries=48)
+def drought_map(year: int, month: str, title: str, revision: str = "main"):
+    """Drought category per alcaldía for one month."""
+    dataDrought = shared_dataset("drought", revision)
+    return plot_static_map(dataDrought[(dataDrought['YEAR'] == year)
+                                       & (dataDrought['MONTH'] == month)], title)
+
+# ------------------------------------------------------------------------------
+# PAGE INFORMATION
+# ------------------------------------------------------------------------------
+
+st.set_page_config(
+    layout="wide",
+    page_title="Dashboard : Futuro del Agua en CDMX",
+    page_icon="🚰",  
+    initial_sidebar_state="expanded"
+    )
+
+# Main page content
+st.markdown("# Sequía en la Ciudad de México")
+st.sidebar.markdown("# Time series y Mapas de Sequía/Escasez")
+show_cache_stats()
+
+t1, t2 = st.tabs([
+    "🌵 Evolución Sequía",
+    "🏞️ Niveles del Cutzamala"
+    ])
+
+# ----------------------------------------
+#  TAB2 : Evolucion de Sequia
+# ----------------------------------------
+
+with t1 : 
+
+    selected_range = st.slider(
+    "Selecciona un rango de años",
+    min_value=2003,
+    max_value=2003,
+    value=(2003, 2023)  # Initial lower and upper bounds
+    )
+
+    fig1 = drought_series(*selected_range, revision="main")
 
     # WRITING FIRST PLOT
-    st.write(fig1)
+    st.plotly_chart(fig1)
     st.markdown(
         """
         <p  style='color:grey; font-size:13px;margin-bottom:0px;'>
@@ -223,32 +204,28 @@ with t1 :
         value=2023  # default starting point
     )
 
-    dataDroughtJan = dataDrought[(dataDrought['YEAR'] == value)
-                                & (dataDrought['MONTH'] == "January")]
-    dataDroughtApril = dataDrought[(dataDrought['YEAR'] == value) 
-                                & (dataDrought['MONTH'] == "April")]
-    dataDroughtJuly = dataDrought[(dataDrought['YEAR'] == value) 
-                                & (dataDrought['MONTH'] == "July")]
-    dataDroughtOct = dataDrought[(dataDrought['YEAR'] == value) 
-                                & (dataDrought['MONTH'] == "October")]
+    # The four seasonal maps are built concurrently, then shown in order
+    maps = build_many({
+        month: (drought_map, value, month, title, "main")
+        for month, title in (("January", "Escasez en Enero"),
+                             ("April", "Escasez en Abril"),
+                             ("July", "Escasez en Julio"),
+                             ("October", "Escasez en Octubre"))
+    })
 
     col1,col2,col3,col4 = st.columns([1, 1, 1 , 1])  # adjust ratio for width
 
     with col1 : 
-        map1 = plot_static_map(dataDroughtJan, "Escasez en Enero")
-        st.write(map1)
+        st.plotly_chart(maps["January"])
         
     with col2 : 
-        map2 = plot_static_map(dataDroughtApril, "Escasez en Abril")
-        st.write(map2)
+        st.plotly_chart(maps["April"])
 
     with col3 : 
-        map3 = plot_static_map(dataDroughtJuly, "Escasez en Julio")
-        st.write(map3)
+        st.plotly_chart(maps["July"])
         
     with col4 : 
-        map4 = plot_static_map(dataDroughtOct, "Escasez en Octubre")
-        st.write(map4)
+        st.plotly_chart(maps["October"])
 
     # WRITING FIRST PLOT
     st.markdown(
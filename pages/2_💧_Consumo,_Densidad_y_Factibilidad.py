@@ -19,12 +19,20 @@ import pandas as pd
 
 # Treemap visualization
 import plotly.express as px # Interactive
-import geopandas as gpd
 
-import duckdb
-from huggingface_hub import hf_hub_url
+from utils.cache import cached, show_cache_stats
+from utils.data import DATASETS, load_many, pins, shared_dataset
+from utils.figures import build_many, cached_figure
+from utils.reports import report_cube
+from utils.rollups import (ROLLUP_MEASURES, consumption_by_colonia, drill_down, rollup_bars, rollup_row,
+                           rollup_table)
 import textwrap
 
+CONSUMO_FILE = DATASETS["consumo19"]["filename"]
+DENSIDAD_FILE = DATASETS["densidadHogares"]["filename"]
+HABCONS_FILE = DATASETS["habCons"]["filename"]
+FACTIBILIDAD_FILE = DATASETS["factibilidad"]["filename"]
+
 # Configure warnings to keep the output clean.
 warnings.filterwarnings("ignore")
 
@@ -32,202 +40,31 @@ warnings.filterwarnings("ignore")
 # Functions
 # ------------------------------------------------------------------------------
 
-# Cache the connection (resource-level)
-@st.cache_resource
-def get_con():
-    con = duckdb.connect()
-    con.execute("INSTALL httpfs; LOAD httpfs;")
-    return con
-
-# Cache the data (data-level)
-@st.cache_data(ttl=6*3600, show_spinner="Cargando datos de consumo y demanda…")
-def load_datasets(repo_id: str, filename: str, revision: str = "main"):
-    # Build a stable CDN URL (supports HTTP range properly)
-    url = hf_hub_url(
-        repo_id=repo_id,
-        filename=filename,
-        repo_type="dataset",
-        revision=revision,
-    )
-    con = get_con()
-    # Use parameter binding so the SQL text stays stable for caching
-    return con.execute("SELECT * FROM read_parquet($url)", {"url": url}).df()
-        
 # Helper: tidy/wrap long labels so they don't overflow tiles
 def wrap_label(s, width=18):
     if pd.isna(s):
         return s
     return "<br>".join(textwrap.fill(str(s), width=width).split("\n"))
 
-# ------------------------------------------------------------------------------
-# LOADING DATA
-# ------------------------------------------------------------------------------
-
-dataConsumo19 = load_datasets(
-    repo_id="danielmlvz/water-dashboard",
-    filename="consumo19/part-0.parquet",
-    revision="main",
-)
-
-hogaresGrado = load_datasets(
-    repo_id="danielmlvz/water-dashboard",
-    filename="densidadHogares/part-0.parquet",
-    revision="main"
-)
-hogaresGrado["geometry"] = gpd.GeoSeries.from_wkt(hogaresGrado["geometry"])
-hogaresGrado = gpd.GeoDataFrame(hogaresGrado, geometry="geometry")
-hogaresGrado = hogaresGrado.set_crs(crs=32614)
-hogaresGrado = hogaresGrado.to_crs(4326)  
-
-habCons = load_datasets(
-    repo_id="danielmlvz/water-dashboard",
-    filename="habCons/part-0.parquet",
-    revision="main",
-)
-habCons["geometry"] = gpd.GeoSeries.from_wkt(habCons["geometry"])
-habCons = gpd.GeoDataFrame(habCons, geometry="geometry")
-habCons = habCons.set_crs(epsg=4326, inplace=True)
-
-hogaresGrado = pd.merge(hogaresGrado,
-                        habCons[["cve_col", "colonia"]],
-                        on="cve_col", how="left")
-hogaresGrado.drop(columns="colonia_x", inplace=True)
-hogaresGrado.rename(columns={"colonia_y" : "colonia"}, inplace=True)
-
-factibilidad = load_datasets(
-    repo_id="danielmlvz/water-dashboard",
-    filename="factibilidad/part-0.parquet",
-    revision="main",
-)
-
-# Coverting first to shapely and then to a geopandas df and adjust crs to 4326
-factibilidad["geometry"] = gpd.GeoSeries.from_wkt(factibilidad["geometry"])
-factibilidad = gpd.GeoDataFrame(factibilidad, geometry="geometry")
-factibilidad = factibilidad.set_crs(epsg=4326, inplace=True)
-
-# ------------------------------------------------------------------------------
-# PAGE INFORMATION
-# ------------------------------------------------------------------------------
-st.set_page_config(
-    layout="wide",
-    page_title="Dashboard : Futuro del Agua en CDMX",
-    page_icon="🚰",  
-    initial_sidebar_state="expanded"
-    )
-
-# Main page content
-st.markdown("# Consumo de Agua en la Ciudad de México")
-st.markdown(
-    """
-    <p  style='color:grey; font-size:13px;margin-bottom:10px;'>
-        Información de consumo disponible por bimestre del año 2019.
-    </p>
-    """,
-    unsafe_allow_html=True
-)
-
-st.sidebar.markdown("# Consumo y Demanda de Agua en la CDMX")
-
-# -------------------------------------------
-#  DATA AGGREGATION THAT WORKS FOR ALL TABS
-# -------------------------------------------
-
-# Add filter
-# option = st.selectbox(
-#     "Selecciona un bimestre disponible :",
-#     ("Febrero", "Abril", "Junio"),
-# )
-
-# mappingDate = {"Febrero" : "2019-02-28", 
-#             "Abril" : "2019-04-30",
-#             "Junio" : "2019-06-30"}
-
-# Filtering using the provided bimester and date by user
-consF = dataConsumo19[dataConsumo19['fecha_referencia'] == "2019-06-30"]
-
-# Neighborhood aggregation
-consWatAgg = consF.groupby(['colonia', 'alcaldia']).agg({
-    'consumo_total': 'sum',
-    'inmuebles_domesticos': 'sum',
-    'consumo_total_dom': 'sum',
-    'inmuebles_no_domesticos': 'sum',
-    'consumo_total_no_dom': 'sum',
-    'inmuebles_mixtos': 'sum',
-    'consumo_total_mixto': 'sum',
-    'total_inmuebles': 'sum'
-}).reset_index()
-
-# We filter out rows where all consumption values are zero
-consWatAgg = consWatAgg[~(consWatAgg.iloc[:, 2:] == 0).all(axis=1)]
-
-# insert a pivot and create new columns based on indice_des 
-shareIdxDev = consF.pivot_table(
-    index=['colonia', 'alcaldia'],
-    columns='indice_des',
-    values='total_inmuebles',
-    aggfunc='sum'
-).reset_index()
-
-allAgg = consWatAgg.merge(shareIdxDev, on=['colonia', 'alcaldia'], how='left')
-allAgg.fillna(0, inplace=True)
-allAgg = allAgg.sort_values(by="consumo_total", ascending=False)
-
-# -----------------------------------------
-# TABS
-# -----------------------------------------
-
-tab1, tab2, tab3 = st.tabs([
-    "🏢 Top 20 Colonias más consumidoras",
-    "📈 # Inmuebles vs Consumo",
-    "🔍 Consumo en tu colonia (mapa 🗺️)"
-])
-
-with tab1 : 
+@cached(max_entries=4, pin=pins(CONSUMO_FILE), name="consumo/top20")
+def top_colonias(revision: str = "main"):
+    """Global Top 20 colonias by consumo_total, with tile labels."""
+    allAgg = consumption_by_colonia(revision)
 
     # Keep only the global Top 20 by consumo_total 
     d_top = allAgg.nlargest(20, "consumo_total").copy()
-    
+
     # Formatting the custom label
     d_top['label'] = d_top.apply(lambda row: f"{row['colonia']},<br>{row['alcaldia']}<br>({int(row['consumo_total'])} m³)", axis=1)
-    
+
     # Wrap long colonia names for readability inside tiles
     d_top["colonia_wrapped"] = d_top["colonia"].apply(wrap_label)
+    return d_top
 
-    # -----------------------------------------
-    #                  KPIs
-    # -----------------------------------------
+@cached_figure("consumo", "treemap", sources=(CONSUMO_FILE,))
+def top20_treemap(revision: str = "main"):
+    d_top = top_colonias(revision)
 
-    colsKPI1, colsKPI2 = st.columns([1,1])
-    
-    with colsKPI1 : 
-        total_consumo_top20 = d_top["consumo_total"].sum()
-
-        # Wrap metric in a centered div
-        st.markdown(
-            f"""
-            <div style="text-align: center;">
-                <h4 style="margin-bottom:0;">Consumo Total Bimestral de las 20 Colonias (m³)</h4>
-                <h2 style="margin-top:0;">{total_consumo_top20:,.0f}</h2>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-    with colsKPI2:
-        # Wrap metric in a centered div
-        st.markdown(
-            f"""
-            <div style="text-align: center;">
-                <h4 style="margin-bottom:0;">Equivalente a llenar Estadios Aztecas (1.8 millones m³ c/u)</h4>
-                <h2 style="margin-top:0;">{total_consumo_top20 / 1800000:.2f}</h2>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-    
-    # -----------------------------------------
-    #     TREE MAP : TOP 20 colonias
-    # -----------------------------------------
     # Build figure
     fig = px.treemap(
         d_top,
@@ -283,175 +120,146 @@ with tab1 :
 
     # Optional: make root tile a neutral color (less dominant)
     fig.update_traces(root_color="lightgray")
+    return fig
 
-    # In Streamlit:
-    st.plotly_chart(fig, use_container_width=True)
+@cached_figure("consumo", "donut_idu", sources=(CONSUMO_FILE,))
+def idu_donut(revision: str = "main"):
+    d_top = top_colonias(revision)
 
-    # -----------------------------------------
-    #     PIE PLOTS : PROPORCIONES
-    # -----------------------------------------
-    
-    col1, col2 = st.columns([2,2])
-
-    # ----------------------------
-    #       IDX DESARROLLO
-    # ----------------------------
-    
-    with col1 : 
-        
-        # --- Consistent color map with your other plots ---
-        color_map = {
-            "ALTO":   "#1f77b4",  # blue
-            "MEDIO":  "#2ca02c",  # green
-            "BAJO":   "#ff7f0e",  # orange
-            "POPULAR":"#d62728",  # red
-        }
-        order_idx = ["ALTO", "MEDIO", "BAJO", "POPULAR"]
-
-        # ----- Build the Top-20 slice sums from d_top -----
-        # Make sure columns exist and are numeric
-        cols_idu = ["ALTO", "BAJO", "MEDIO", "POPULAR"]
-        d_top_num = d_top.copy()
-        for c in cols_idu:
-            d_top_num[c] = pd.to_numeric(d_top_num[c], errors="coerce").fillna(0)
-
-        sizes = [d_top_num[c].sum() for c in cols_idu]
-        labels = ["ALTO", "BAJO", "MEDIO", "POPULAR"]
-
-        df_pie = pd.DataFrame({"IDU": labels, "Proporcion": sizes})
-        # sort by fixed order for stable legend
-        df_pie["IDU"] = pd.Categorical(df_pie["IDU"], categories=order_idx, ordered=True)
-        df_pie = df_pie.sort_values("IDU")
-
-        # ----- Donut chart -----
-        fig_pie = px.pie(
-            df_pie,
-            names="IDU",
-            values="Proporcion",
-            color="IDU",
-            color_discrete_map=color_map,
-            hole=0.55,  # donut
-        )
-
-        fig_pie.update_traces(
-            textinfo="percent+label",
-            textposition="inside",
-            insidetextorientation="horizontal",
-            pull=[0.03 if v == df_pie["Proporcion"].max() else 0 for v in df_pie["Proporcion"]],  # slight emphasis on largest
-            marker=dict(line=dict(width=1, color="white")),
-            hovertemplate="<b>%{label}</b><br>Proporción: %{percent}<br>Valor: %{value:,.0f}<extra></extra>"
-        )
+    # --- Consistent color map with your other plots ---
+    color_map = {
+        "ALTO":   "#1f77b4",  # blue
+        "MEDIO":  "#2ca02c",  # green
+        "BAJO":   "#ff7f0e",  # orange
+        "POPULAR":"#d62728",  # red
+    }
+    order_idx = ["ALTO", "MEDIO", "BAJO", "POPULAR"]
 
-        total_val = df_pie["Proporcion"].sum()
-        fig_pie.update_layout(
-            title=dict(
-                text="Proporción de IDU en las Top 20 colonias más consumidoras",
-                x=0.02, xanchor="left", font=dict(size=20)
-            ),
-            margin=dict(t=60, r=20, b=20, l=20),
-            legend=dict(orientation="v", yanchor="bottom", y=0.80, xanchor="left", x=0, title="Índice de Desarrollo"),
-            annotations=[
-                dict(
-                    text=f"Total Inmuebles<br><b>{total_val:,.0f}</b>",
-                    showarrow=False, x=0.5, y=0.5, font=dict(size=14, color="gray")
-                )
-            ],
-            height=520,
-        )
+    # ----- Build the Top-20 slice sums from d_top -----
+    # Make sure columns exist and are numeric
+    cols_idu = ["ALTO", "BAJO", "MEDIO", "POPULAR"]
+    d_top_num = d_top.copy()
+    for c in cols_idu:
+        d_top_num[c] = pd.to_numeric(d_top_num[c], errors="coerce").fillna(0)
+
+    sizes = [d_top_num[c].sum() for c in cols_idu]
+    labels = ["ALTO", "BAJO", "MEDIO", "POPULAR"]
+
+    df_pie = pd.DataFrame({"IDU": labels, "Proporcion": sizes})
+    # sort by fixed order for stable legend
+    df_pie["IDU"] = pd.Categorical(df_pie["IDU"], categories=order_idx, ordered=True)
+    df_pie = df_pie.sort_values("IDU")
+
+    # ----- Donut chart -----
+    fig_pie = px.pie(
+        df_pie,
+        names="IDU",
+        values="Proporcion",
+        color="IDU",
+        color_discrete_map=color_map,
+        hole=0.55,  # donut
+    )
 
-        st.plotly_chart(fig_pie, use_container_width=True)
+    fig_pie.update_traces(
+        textinfo="percent+label",
+        textposition="inside",
+        insidetextorientation="horizontal",
+        pull=[0.03 if v == df_pie["Proporcion"].max() else 0 for v in df_pie["Proporcion"]],  # slight emphasis on largest
+        marker=dict(line=dict(width=1, color="white")),
+        hovertemplate="<b>%{label}</b><br>Proporción: %{percent}<br>Valor: %{value:,.0f}<extra></extra>"
+    )
 
-    # ----------------------------
-    #       IDX DESARROLLO
-    # ----------------------------
-    
-    with col2 : 
-        # ---------- Datos (a partir de d_top = d) ----------
-        cols_inm = ["inmuebles_domesticos", "inmuebles_no_domesticos", "inmuebles_mixtos"]
-        d_inm = d_top.copy()
-        for c in cols_inm:
-            d_inm[c] = pd.to_numeric(d_inm[c], errors="coerce").fillna(0)
-
-        sizes = [
-            d_inm["inmuebles_domesticos"].sum(),
-            d_inm["inmuebles_no_domesticos"].sum(),
-            d_inm["inmuebles_mixtos"].sum(),
-        ]
-        labels = ["Inmuebles Domésticos", "Inmuebles No Domésticos", "Inmuebles Mixtos"]
-
-        df_pie = pd.DataFrame({"Tipo de Inmueble": labels, "Cantidad": sizes})
-
-        # Orden fijo para una leyenda estable
-        order_tipos = ["Inmuebles Domésticos", "Inmuebles No Domésticos", "Inmuebles Mixtos"]
-        df_pie["Tipo de Inmueble"] = pd.Categorical(df_pie["Tipo de Inmueble"],
-                                                    categories=order_tipos, ordered=True)
-        df_pie = df_pie.sort_values("Tipo de Inmueble")
-
-        # Paleta consistente (alta legibilidad)
-        color_map = {
-            "Inmuebles Domésticos": "#ff8c42",   # orange
-            "Inmuebles No Domésticos": "#f6416c",# pink/red
-            "Inmuebles Mixtos": "#6a4c93",       # deep purple
-        }
-
-        # ---------- Donut plot ----------
-        fig_pie = px.pie(
-            df_pie,
-            names="Tipo de Inmueble",
-            values="Cantidad",
-            color="Tipo de Inmueble",
-            color_discrete_map=color_map,
-            hole=0.55,
-        )
+    total_val = df_pie["Proporcion"].sum()
+    fig_pie.update_layout(
+        title=dict(
+            text="Proporción de IDU en las Top 20 colonias más consumidoras",
+            x=0.02, xanchor="left", font=dict(size=20)
+        ),
+        margin=dict(t=60, r=20, b=20, l=20),
+        legend=dict(orientation="v", yanchor="bottom", y=0.80, xanchor="left", x=0, title="Índice de Desarrollo"),
+        annotations=[
+            dict(
+                text=f"Total Inmuebles<br><b>{total_val:,.0f}</b>",
+                showarrow=False, x=0.5, y=0.5, font=dict(size=14, color="gray")
+            )
+        ],
+        height=520,
+    )
+    return fig_pie
+
+@cached_figure("consumo", "donut_inmuebles", sources=(CONSUMO_FILE,))
+def inmuebles_donut(revision: str = "main"):
+    d_top = top_colonias(revision)
+
+    # ---------- Datos (a partir de d_top = d) ----------
+    cols_inm = ["inmuebles_domesticos", "inmuebles_no_domesticos", "inmuebles_mixtos"]
+    d_inm = d_top.copy()
+    for c in cols_inm:
+        d_inm[c] = pd.to_numeric(d_inm[c], errors="coerce").fillna(0)
+
+    sizes = [
+        d_inm["inmuebles_domesticos"].sum(),
+        d_inm["inmuebles_no_domesticos"].sum(),
+        d_inm["inmuebles_mixtos"].sum(),
+    ]
+    labels = ["Inmuebles Domésticos", "Inmuebles No Domésticos", "Inmuebles Mixtos"]
+
+    df_pie = pd.DataFrame({"Tipo de Inmueble": labels, "Cantidad": sizes})
+
+    # Orden fijo para una leyenda estable
+    order_tipos = ["Inmuebles Domésticos", "Inmuebles No Domésticos", "Inmuebles Mixtos"]
+    df_pie["Tipo de Inmueble"] = pd.Categorical(df_pie["Tipo de Inmueble"],
+                                                categories=order_tipos, ordered=True)
+    df_pie = df_pie.sort_values("Tipo de Inmueble")
+
+    # Paleta consistente (alta legibilidad)
+    color_map = {
+        "Inmuebles Domésticos": "#ff8c42",   # orange
+        "Inmuebles No Domésticos": "#f6416c",# pink/red
+        "Inmuebles Mixtos": "#6a4c93",       # deep purple
+    }
 
-        fig_pie.update_traces(
-            textinfo="percent+label",
-            textposition="inside",
-            insidetextorientation="horizontal",
-            marker=dict(line=dict(width=1, color="white")),
-            pull=[0.03 if v == df_pie["Cantidad"].max() else 0 for v in df_pie["Cantidad"]],
-            hovertemplate="<b>%{label}</b><br>Porción: %{percent}<br>Cantidad: %{value:,.0f}<extra></extra>",
-        )
+    # ---------- Donut plot ----------
+    fig_pie = px.pie(
+        df_pie,
+        names="Tipo de Inmueble",
+        values="Cantidad",
+        color="Tipo de Inmueble",
+        color_discrete_map=color_map,
+        hole=0.55,
+    )
 
-        total_val = df_pie["Cantidad"].sum()
-        fig_pie.update_layout(
-            title=dict(
-                text="Proporción del tipo de inmuebles en las Top 20 colonias más consumidoras",
-                x=0.02, xanchor="left", font=dict(size=20)
-            ),
-            margin=dict(t=60, r=20, b=20, l=20),
-            legend=dict(orientation="v", yanchor="bottom", y=0.85, xanchor="left", x=0,
-                        title="Tipo de Inmueble"),
-            annotations=[
-                dict(text=f"Total Inmuebles<br><b>{total_val:,.0f}</b>", x=0.5, y=0.5,
-                    showarrow=False, font=dict(size=14, color="gray"))
-            ],
-            height=520,
-        )
+    fig_pie.update_traces(
+        textinfo="percent+label",
+        textposition="inside",
+        insidetextorientation="horizontal",
+        marker=dict(line=dict(width=1, color="white")),
+        pull=[0.03 if v == df_pie["Cantidad"].max() else 0 for v in df_pie["Cantidad"]],
+        hovertemplate="<b>%{label}</b><br>Porción: %{percent}<br>Cantidad: %{value:,.0f}<extra></extra>",
+    )
 
-        # En Streamlit:
-        st.plotly_chart(fig_pie, use_container_width=True)
+    total_val = df_pie["Cantidad"].sum()
+    fig_pie.update_layout(
+        title=dict(
+            text="Proporción del tipo de inmuebles en las Top 20 colonias más consumidoras",
+            x=0.02, xanchor="left", font=dict(size=20)
+        ),
+        margin=dict(t=60, r=20, b=20, l=20),
+        legend=dict(orientation="v", yanchor="bottom", y=0.85, xanchor="left", x=0,
+                    title="Tipo de Inmueble"),
+        annotations=[
+            dict(text=f"Total Inmuebles<br><b>{total_val:,.0f}</b>", x=0.5, y=0.5,
+                showarrow=False, font=dict(size=14, color="gray"))
+        ],
+        height=520,
+    )
+    return fig_pie
 
-    # --------------------
-    # OBSERVATIONS
-    # --------------------
+@cached_figure("consumo", "scatter", sources=(CONSUMO_FILE,))
+def inmuebles_scatter(revision: str = "main"):
+    # Shallow copy: the mayoria_idx column must not reach the cached frame
+    allAgg = consumption_by_colonia(revision).copy(deep=False)
 
-    st.markdown("---")
-    st.markdown(
-        """
-        **Observaciones**
-        - El Índice de Desarrollo es una construcción estadística mediante
-        variables de tipo socioeconómico derivadas de información oficial,
-        permite diferenciar territorialmente a la población de la Ciudad de
-        México de acuerdo a su nivel de desarrollo económico, agregando 
-        la información a nivel manzana. 
-        """
-    )
-    
-# -----------------------------------------
-#    Relación # Inmuebles vs Consumo (m3)
-# -----------------------------------------
-with tab2 : 
     color_map = {
         "ALTO": "#1f77b4",     # blue
         "MEDIO": "#2ca02c",    # green
@@ -528,6 +336,422 @@ with tab2 :
         hoverlabel=dict(font_size=12),
         uniformtext_minsize=12,
     )
+    return fig
+
+@cached_figure("consumo", "mapa_consumo", sources=(HABCONS_FILE,), max_entries=64)
+def consumo_map(colonia_sel: str, revision: str = "main"):
+    habCons = shared_dataset("habCons", revision)
+
+    # Filtering by colonia selected
+    if colonia_sel != "(Todas)":
+        hab_plot = habCons[habCons["colonia"] == colonia_sel]
+    else:
+        hab_plot = habCons
+
+    hab_plot["C_PROMVIVC"] = pd.to_numeric(hab_plot["C_PROMVIVC"], errors="coerce").clip(1, 5).fillna(1).astype(int)
+
+    label_map = {
+        1: "1 · Muy Bajo",
+        2: "2 · Bajo",
+        3: "3 · Medio",
+        4: "4 · Alto",
+        5: "5 · Muy alto"
+    }
+    hab_plot["C_PROMVIVC_lbl"] = hab_plot["C_PROMVIVC"].map(label_map)
+
+    # Orden fijo en la leyenda
+    category_order = ["1 · Muy Bajo", "2 · Bajo", "3 · Medio", "4 · Alto", "5 · Muy alto"]
+
+    color_map = {
+        "1 · Muy Bajo": "#80deea",  # aqua claro
+        "2 · Bajo":     "#26c6da",  # turquesa medio
+        "3 · Medio":    "#00838f",  # teal profundo
+        "4 · Alto":     "#004d40",  # verde azulado oscuro
+        "5 · Muy alto": "#002633",  # azul marino casi negro
+    }
+
+    # 3) Construir el choropleth como categórico (mejor que continuo para 5 clases)
+    fig = px.choropleth_mapbox(
+        hab_plot,
+        geojson=hab_plot.__geo_interface__,         # GeoJSON directo del GeoDataFrame
+        locations=hab_plot.index,                   # índice como key
+        featureidkey="id",                         # (Plotly usa 'id' por defecto en __geo_interface__)
+        color="C_PROMVIVC_lbl",                    # columna categórica
+        category_orders={"C_PROMVIVC_lbl": category_order},
+        color_discrete_map=color_map,
+        hover_name="colonia",
+        hover_data={
+            "alcaldia": True,
+            "SUM_cons_t": ":,",                    # miles
+            "C_PROMVIVC_lbl": False,               # ya está por color/leyenda
+            "C_PROMVIVC": True,                     # muestra la clase numérica base
+            "Sum_TotHog" : True
+        },
+        mapbox_style="carto-positron",
+        zoom=9.75,
+        center={"lat": 19.36, "lon": -99.1333},
+        opacity=0.75,
+        labels={
+            "SUM_cons_t": "Consumo total (m³)",
+            "C_PROMVIVC": "Clase (1–5)"
+        },
+    )
+
+    # 4) Estilo fino: bordes, leyenda, márgenes
+    fig.update_traces(marker_line_width=0.5, marker_line_color="white")
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=90, b=0),
+        height=700,
+        legend=dict(
+            title="Nivel de Consumo (1–5)",
+            orientation="h",
+            yanchor="bottom", y=0.92,
+            xanchor="left", x=0
+        ),
+        title=dict(
+            text="Consumo Habitacional de Agua en CDMX",
+            font=dict(size=18),
+            x=0,           # center the title
+            yanchor="top"
+        )
+    )
+
+    # Hover limpio
+    fig.update_traces(
+        hovertemplate="<b>%{hovertext}</b><br>"  # hover_name (colonia)
+                    "Alcaldía: %{customdata[0]}<br>"
+                    "Consumo total: %{customdata[1]:,.0f} m³<br>"
+                    "Inmuebles Habitables: %{customdata[4]}<br>"
+                    "Clase: %{customdata[3]}<extra></extra>"
+
+    )
+    return fig
+
+@cached(max_entries=4, pin=pins(DENSIDAD_FILE, HABCONS_FILE), name="consumo/hogares")
+def hogares_con_colonia(revision: str = "main"):
+    """Densidad de hogares with the colonia names of habCons."""
+    hogaresGrado = shared_dataset("densidadHogares", revision)
+    habCons = shared_dataset("habCons", revision)
+
+    hogaresGrado = pd.merge(hogaresGrado,
+                            habCons[["cve_col", "colonia"]],
+                            on="cve_col", how="left")
+    hogaresGrado.drop(columns="colonia_x", inplace=True)
+    hogaresGrado.rename(columns={"colonia_y" : "colonia"}, inplace=True)
+    return hogaresGrado
+
+@cached_figure("consumo", "mapa_densidad", sources=(DENSIDAD_FILE, HABCONS_FILE), max_entries=64)
+def densidad_map(colonia_sel: str, revision: str = "main"):
+    hogaresGrado = hogares_con_colonia(revision)
+
+    # Filtering by colonia selected
+    if colonia_sel != "(Todas)":
+        hogaresFil = hogaresGrado[hogaresGrado["colonia"] == colonia_sel]
+    else:
+        hogaresFil = hogaresGrado
+
+
+    category_order = ["Muy baja concentración habitacional",
+                      "Baja concentración habitacional",
+                      "Media concentración habitacional",
+                      "Alta concentración habitacional",
+                      "5 · Muy alta concentración habitacional"]
+
+    color_map = {
+        "Muy baja concentración habitacional": "#440154",  # dark purple
+        "Baja concentración habitacional":     "#3b528b",  # blue
+        "Media concentración habitacional":    "#21918c",  # teal/green
+        "Alta concentración habitacional":     "#5ec962",  # light green
+        "Muy alta concentración habitacional": "#fde725"   # yellow
+    }
+
+    fig = px.choropleth_mapbox(
+        hogaresFil,
+        geojson=hogaresFil.__geo_interface__,         # GeoJSON directo del GeoDataFrame
+        locations=hogaresFil.index,                   # índice como key
+        color="grado",                    # columna categórica
+        category_orders={"grado": category_order},
+        color_discrete_map=color_map,               # nuestro mapa discreto Viridis
+        hover_name="colonia",
+        hover_data={
+            "alcaldia": True,
+            "grado": True,               # ya está por color/leyenda
+        },
+        mapbox_style="carto-positron",
+        zoom=9.75,
+        center={"lat": 19.36, "lon": -99.1333},
+        opacity=0.75,
+        labels={
+            "grado": "Densidad poblacional",
+        },
+    )
+
+    # 4) Estilo fino: bordes, leyenda, márgenes
+    fig.update_traces(marker_line_width=0.5, marker_line_color="white")
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=90, b=0),
+        height=700,
+        legend=dict(
+            title="Clasificación de la Concentración",
+            orientation="v",
+            yanchor="bottom", y=0.85,
+            xanchor="left", x=0
+        ),
+        title=dict(
+            text="Densidad Poblacional en CDMX por Colonias",
+            font=dict(size=18),
+            x=0,           # center the title
+            yanchor="top"
+        )
+    )
+
+    # Hover limpio
+    fig.update_traces(
+        hovertemplate="<b>%{hovertext}</b><br>"  # hover_name (colonia)
+                    "Alcaldía: %{customdata[0]}<br>"
+                    "Grado: %{customdata[1]}<extra></extra>"                        
+    )
+    return fig
+
+@cached_figure("consumo", "mapa_factibilidad", sources=(FACTIBILIDAD_FILE,), max_entries=64)
+def factibilidad_map(colonia_sel: str, revision: str = "main"):
+    factibilidad = shared_dataset("factibilidad", revision)
+
+    mapColor = {
+        'ROJO': 'red',
+        'AMARILLO': 'yellow',
+        'NARANJA': 'orange',
+        'VERDE': 'green'
+    }
+
+    factibilidad['color'] = factibilidad['fact_hidr'].map(mapColor)
+    factibilidad = factibilidad.reset_index(drop=True)
+    factibilidad['id'] = factibilidad.index
+
+    # Filtering by colonia selected
+    if colonia_sel != "(Todas)":
+        hogaresFil = factibilidad[factibilidad["colonia"] == colonia_sel]
+    else:
+        hogaresFil = factibilidad
+
+    category_order = ["ROJO",
+                      "AMARILLO",
+                      "NARANJA",
+                      "VERDE"]
+
+    fig = px.choropleth_mapbox(
+        hogaresFil,
+        geojson=hogaresFil.__geo_interface__,         # GeoJSON directo del GeoDataFrame
+        locations=hogaresFil.index,                   # índice como key
+        color="fact_hidr",                    # columna categórica
+        category_orders={"fact_hidr": category_order},
+        color_discrete_map=mapColor,               # nuestro mapa discreto Viridis
+        hover_name="colonia",
+        hover_data={
+            "alcaldia": True,
+            "fact_hidr": True,               # ya está por color/leyenda
+        },
+        mapbox_style="carto-positron",
+        zoom=9.75,
+        center={"lat": 19.36, "lon": -99.1333},
+        opacity=0.75,
+        labels={
+            "grado": "Densidad poblacional",
+        },
+    )
+
+    # 4) Estilo fino: bordes, leyenda, márgenes
+    fig.update_traces(marker_line_width=0.1, marker_line_color="black")
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=90, b=0),
+        height=700,
+        legend=dict(
+            title="Clasificación de la Factibilidad",
+            orientation="h",
+            yanchor="bottom", y=0.95,
+            xanchor="left", x=0
+        ),
+        title=dict(
+            text="Grado de Factibilidad Hídrica en CDMX",
+            font=dict(size=18),
+            x=0,           # center the title
+            yanchor="top"
+        )
+    )
+
+    # Hover limpio
+    fig.update_traces(
+        hovertemplate="<b>%{hovertext}</b><br>"  # hover_name (colonia)
+                    "Alcaldía: %{customdata[0]}<br>"
+                    "Factibilidad: %{customdata[1]}<extra></extra>"                        
+    )
+    return fig
+
+# ------------------------------------------------------------------------------
+# LOADING DATA
+# ------------------------------------------------------------------------------
+
+# All the page datasets are fetched concurrently, so the chart builders below
+# find them loaded. Each one is a copy-on-write view of a frame shared by
+# every session (geometry decoded, EPSG:4326)
+frames = load_many({
+    name: (shared_dataset, name, "main")
+    for name in ("consumo19", "densidadHogares", "habCons", "factibilidad")
+})
+
+habCons = frames["habCons"]
+
+# ------------------------------------------------------------------------------
+# PAGE INFORMATION
+# ------------------------------------------------------------------------------
+st.set_page_config(
+    layout="wide",
+    page_title="Dashboard : Futuro del Agua en CDMX",
+    page_icon="🚰",  
+    initial_sidebar_state="expanded"
+    )
+
+# Main page content
+st.markdown("# Consumo de Agua en la Ciudad de México")
+st.markdown(
+    """
+    <p  style='color:grey; font-size:13px;margin-bottom:10px;'>
+        Información de consumo disponible por bimestre del año 2019.
+    </p>
+    """,
+    unsafe_allow_html=True
+)
+
+st.sidebar.markdown("# Consumo y Demanda de Agua en la CDMX")
+show_cache_stats()
+
+# -------------------------------------------
+#  DATA AGGREGATION THAT WORKS FOR ALL TABS
+# -------------------------------------------
+
+# Add filter
+# option = st.selectbox(
+#     "Selecciona un bimestre disponible :",
+#     ("Febrero", "Abril", "Junio"),
+# )
+
+# mappingDate = {"Febrero" : "2019-02-28", 
+#             "Abril" : "2019-04-30",
+#             "Junio" : "2019-06-30"}
+
+# Consumo and inmuebles per colonia, shared by every session
+allAgg = consumption_by_colonia(revision="main")
+
+# -----------------------------------------
+# TABS
+# -----------------------------------------
+
+tab1, tab2, tab3, tab4 = st.tabs([
+    "🏢 Top 20 Colonias más consumidoras",
+    "📈 # Inmuebles vs Consumo",
+    "🔍 Consumo en tu colonia (mapa 🗺️)",
+    "🧭 Por alcaldía y colonia"
+])
+
+with tab1 : 
+
+    # Global Top 20 by consumo_total
+    d_top = top_colonias(revision="main")
+
+    # The treemap and both donuts are built concurrently, then shown in order
+    charts = build_many({
+        "treemap": (top20_treemap, "main"),
+        "donut_idu": (idu_donut, "main"),
+        "donut_inmuebles": (inmuebles_donut, "main"),
+    })
+
+    # -----------------------------------------
+    #                  KPIs
+    # -----------------------------------------
+
+    colsKPI1, colsKPI2 = st.columns([1,1])
+    
+    with colsKPI1 : 
+        total_consumo_top20 = d_top["consumo_total"].sum()
+
+        # Wrap metric in a centered div
+        st.markdown(
+            f"""
+            <div style="text-align: center;">
+                <h4 style="margin-bottom:0;">Consumo Total Bimestral de las 20 Colonias (m³)</h4>
+                <h2 style="margin-top:0;">{total_consumo_top20:,.0f}</h2>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+    with colsKPI2:
+        # Wrap metric in a centered div
+        st.markdown(
+            f"""
+            <div style="text-align: center;">
+                <h4 style="margin-bottom:0;">Equivalente a llenar Estadios Aztecas (1.8 millones m³ c/u)</h4>
+                <h2 style="margin-top:0;">{total_consumo_top20 / 1800000:.2f}</h2>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+    
+    # -----------------------------------------
+    #     TREE MAP : TOP 20 colonias
+    # -----------------------------------------
+    fig = charts["treemap"]
+
+    # In Streamlit:
+    st.plotly_chart(fig, use_container_width=True)
+
+    # -----------------------------------------
+    #     PIE PLOTS : PROPORCIONES
+    # -----------------------------------------
+    
+    col1, col2 = st.columns([2,2])
+
+    # ----------------------------
+    #       IDX DESARROLLO
+    # ----------------------------
+    
+    with col1 : 
+        
+        fig_pie = charts["donut_idu"]
+
+        st.plotly_chart(fig_pie, use_container_width=True)
+
+    # ----------------------------
+    #       IDX DESARROLLO
+    # ----------------------------
+    
+    with col2 : 
+        fig_pie = charts["donut_inmuebles"]
+
+        # En Streamlit:
+        st.plotly_chart(fig_pie, use_container_width=True)
+
+    # --------------------
+    # OBSERVATIONS
+    # --------------------
+
+    st.markdown("---")
+    st.markdown(
+        """
+        **Observaciones**
+        - El Índice de Desarrollo es una construcción estadística mediante
+        variables de tipo socioeconómico derivadas de información oficial,
+        permite diferenciar territorialmente a la población de la Ciudad de
+        México de acuerdo a su nivel de desarrollo económico, agregando 
+        la información a nivel manzana. 
+        """
+    )
+    
+# -----------------------------------------
+#    Relación # Inmuebles vs Consumo (m3)
+# -----------------------------------------
+with tab2 : 
+    fig = inmuebles_scatter(revision="main")
 
     # # --- toggle for OLS trend ---
     # show_trend = st.toggle("Mostrar línea de tendencia (OLS)", value=False, key="trend_tab2")
@@ -580,6 +804,13 @@ with tab3 :
         placeholder="Escribe para buscar…"
     )
     
+    # The three maps are built concurrently, then shown in order
+    maps = build_many({
+        "consumo": (consumo_map, colonia_sel, "main"),
+        "densidad": (densidad_map, colonia_sel, "main"),
+        "factibilidad": (factibilidad_map, colonia_sel, "main"),
+    })
+
     col1Find, col2Find, col3Find = st.columns([2,2,2])    
     
 # --------------------------------
@@ -588,89 +819,7 @@ with tab3 :
     
     with col1Find : 
         
-        # Filtering by colonia selected
-        if colonia_sel != "(Todas)":
-            hab_plot = habCons[habCons["colonia"] == colonia_sel]
-        else:
-            hab_plot = habCons
-
-        hab_plot["C_PROMVIVC"] = pd.to_numeric(hab_plot["C_PROMVIVC"], errors="coerce").clip(1, 5).fillna(1).astype(int)
-
-        label_map = {
-            1: "1 · Muy Bajo",
-            2: "2 · Bajo",
-            3: "3 · Medio",
-            4: "4 · Alto",
-            5: "5 · Muy alto"
-        }
-        hab_plot["C_PROMVIVC_lbl"] = hab_plot["C_PROMVIVC"].map(label_map)
-
-        # Orden fijo en la leyenda
-        category_order = ["1 · Muy Bajo", "2 · Bajo", "3 · Medio", "4 · Alto", "5 · Muy alto"]
-            
-        color_map = {
-            "1 · Muy Bajo": "#80deea",  # aqua claro
-            "2 · Bajo":     "#26c6da",  # turquesa medio
-            "3 · Medio":    "#00838f",  # teal profundo
-            "4 · Alto":     "#004d40",  # verde azulado oscuro
-            "5 · Muy alto": "#002633",  # azul marino casi negro
-        }
-
-        # 3) Construir el choropleth como categórico (mejor que continuo para 5 clases)
-        fig = px.choropleth_mapbox(
-            hab_plot,
-            geojson=hab_plot.__geo_interface__,         # GeoJSON directo del GeoDataFrame
-            locations=hab_plot.index,                   # índice como key
-            featureidkey="id",                         # (Plotly usa 'id' por defecto en __geo_interface__)
-            color="C_PROMVIVC_lbl",                    # columna categórica
-            category_orders={"C_PROMVIVC_lbl": category_order},
-            color_discrete_map=color_map,
-            hover_name="colonia",
-            hover_data={
-                "alcaldia": True,
-                "SUM_cons_t": ":,",                    # miles
-                "C_PROMVIVC_lbl": False,               # ya está por color/leyenda
-                "C_PROMVIVC": True,                     # muestra la clase numérica base
-                "Sum_TotHog" : True
-            },
-            mapbox_style="carto-positron",
-            zoom=9.75,
-            center={"lat": 19.36, "lon": -99.1333},
-            opacity=0.75,
-            labels={
-                "SUM_cons_t": "Consumo total (m³)",
-                "C_PROMVIVC": "Clase (1–5)"
-            },
-        )
-
-        # 4) Estilo fino: bordes, leyenda, márgenes
-        fig.update_traces(marker_line_width=0.5, marker_line_color="white")
-        fig.update_layout(
-            margin=dict(l=0, r=0, t=90, b=0),
-            height=700,
-            legend=dict(
-                title="Nivel de Consumo (1–5)",
-                orientation="h",
-                yanchor="bottom", y=0.92,
-                xanchor="left", x=0
-            ),
-            title=dict(
-                text="Consumo Habitacional de Agua en CDMX",
-                font=dict(size=18),
-                x=0,           # center the title
-                yanchor="top"
-            )
-        )
-
-        # Hover limpio
-        fig.update_traces(
-            hovertemplate="<b>%{hovertext}</b><br>"  # hover_name (colonia)
-                        "Alcaldía: %{customdata[0]}<br>"
-                        "Consumo total: %{customdata[1]:,.0f} m³<br>"
-                        "Inmuebles Habitables: %{customdata[4]}<br>"
-                        "Clase: %{customdata[3]}<extra></extra>"
-                        
-        )
+        fig = maps["consumo"]
 
         # 5) Mostrar en Streamlit
         st.plotly_chart(fig, use_container_width=True)
@@ -691,75 +840,9 @@ with tab3 :
 
     with col2Find : 
         
-        # Filtering by colonia selected
-        if colonia_sel != "(Todas)":
-            hogaresFil = hogaresGrado[hogaresGrado["colonia"] == colonia_sel]
-        else:
-            hogaresFil = hogaresGrado
-
-        
-        category_order = ["Muy baja concentración habitacional",
-                          "Baja concentración habitacional",
-                          "Media concentración habitacional",
-                          "Alta concentración habitacional",
-                          "5 · Muy alta concentración habitacional"]
+        fig = maps["densidad"]
         
-        color_map = {
-            "Muy baja concentración habitacional": "#440154",  # dark purple
-            "Baja concentración habitacional":     "#3b528b",  # blue
-            "Media concentración habitacional":    "#21918c",  # teal/green
-            "Alta concentración habitacional":     "#5ec962",  # light green
-            "Muy alta concentración habitacional": "#fde725"   # yellow
-        }
-                
-        fig = px.choropleth_mapbox(
-            hogaresFil,
-            geojson=hogaresFil.__geo_interface__,         # GeoJSON directo del GeoDataFrame
-            locations=hogaresFil.index,                   # índice como key
-            color="grado",                    # columna categórica
-            category_orders={"grado": category_order},
-            color_discrete_map=color_map,               # nuestro mapa discreto Viridis
-            hover_name="colonia",
-            hover_data={
-                "alcaldia": True,
-                "grado": True,               # ya está por color/leyenda
-            },
-            mapbox_style="carto-positron",
-            zoom=9.75,
-            center={"lat": 19.36, "lon": -99.1333},
-            opacity=0.75,
-            labels={
-                "grado": "Densidad poblacional",
-            },
-        )
-
-        # 4) Estilo fino: bordes, leyenda, márgenes
-        fig.update_traces(marker_line_width=0.5, marker_line_color="white")
-        fig.update_layout(
-            margin=dict(l=0, r=0, t=90, b=0),
-            height=700,
-            legend=dict(
-                title="Clasificación de la Concentración",
-                orientation="v",
-                yanchor="bottom", y=0.85,
-                xanchor="left", x=0
-            ),
-            title=dict(
-                text="Densidad Poblacional en CDMX por Colonias",
-                font=dict(size=18),
-                x=0,           # center the title
-                yanchor="top"
-            )
-        )
-
-        # Hover limpio
-        fig.update_traces(
-            hovertemplate="<b>%{hovertext}</b><br>"  # hover_name (colonia)
-                        "Alcaldía: %{customdata[0]}<br>"
-                        "Grado: %{customdata[1]}<extra></extra>"                        
-        )
-        
-        st.write(fig)
+        st.plotly_chart(fig)
 
         st.markdown(
             """
@@ -776,76 +859,9 @@ with tab3 :
 
     with col3Find : 
         
-        mapColor = {
-            'ROJO': 'red',
-            'AMARILLO': 'yellow',
-            'NARANJA': 'orange',
-            'VERDE': 'green'
-        }
-        
-        factibilidad['color'] = factibilidad['fact_hidr'].map(mapColor)
-        factibilidad = factibilidad.reset_index(drop=True)
-        factibilidad['id'] = factibilidad.index
-        
-        # Filtering by colonia selected
-        if colonia_sel != "(Todas)":
-            hogaresFil = factibilidad[factibilidad["colonia"] == colonia_sel]
-        else:
-            hogaresFil = factibilidad
+        fig = maps["factibilidad"]
         
-        category_order = ["ROJO",
-                          "AMARILLO",
-                          "NARANJA",
-                          "VERDE"]
-                        
-        fig = px.choropleth_mapbox(
-            hogaresFil,
-            geojson=hogaresFil.__geo_interface__,         # GeoJSON directo del GeoDataFrame
-            locations=hogaresFil.index,                   # índice como key
-            color="fact_hidr",                    # columna categórica
-            category_orders={"fact_hidr": category_order},
-            color_discrete_map=mapColor,               # nuestro mapa discreto Viridis
-            hover_name="colonia",
-            hover_data={
-                "alcaldia": True,
-                "fact_hidr": True,               # ya está por color/leyenda
-            },
-            mapbox_style="carto-positron",
-            zoom=9.75,
-            center={"lat": 19.36, "lon": -99.1333},
-            opacity=0.75,
-            labels={
-                "grado": "Densidad poblacional",
-            },
-        )
-
-        # 4) Estilo fino: bordes, leyenda, márgenes
-        fig.update_traces(marker_line_width=0.1, marker_line_color="black")
-        fig.update_layout(
-            margin=dict(l=0, r=0, t=90, b=0),
-            height=700,
-            legend=dict(
-                title="Clasificación de la Factibilidad",
-                orientation="h",
-                yanchor="bottom", y=0.95,
-                xanchor="left", x=0
-            ),
-            title=dict(
-                text="Grado de Factibilidad Hídrica en CDMX",
-                font=dict(size=18),
-                x=0,           # center the title
-                yanchor="top"
-            )
-        )
-
-        # Hover limpio
-        fig.update_traces(
-            hovertemplate="<b>%{hovertext}</b><br>"  # hover_name (colonia)
-                        "Alcaldía: %{customdata[0]}<br>"
-                        "Factibilidad: %{customdata[1]}<extra></extra>"                        
-        )
-        
-        st.write(fig)
+        st.plotly_chart(fig)
 
         st.markdown(
             """
@@ -882,6 +898,51 @@ with tab3 :
         unsafe_allow_html=True
     )
 
+with tab4 :
+
+    # -----------------------------------------
+    #     DRILL-DOWN : ALCALDÍA → COLONIA
+    # -----------------------------------------
+
+    # Streamlit runs every tab on each rerun: the drill-down (reports
+    # aggregation, colonia join and rollup) is only built once it is opened
+    if st.toggle("Mostrar vista por alcaldía y colonia", value=False, key="drill_open"):
+
+        # Every level comes from one precomputed table (index lookups); the
+        # reports are those of the latest year
+        year_reportes = int(report_cube(revision="main").years[-1])
+        rollups = rollup_table(year_reportes, revision="main")
+
+        colMeasure, colBack = st.columns([3,1])
+        with colMeasure :
+            measure = st.selectbox("Indicador", options=list(ROLLUP_MEASURES), format_func=ROLLUP_MEASURES.get)
+        alcaldia_sel = st.session_state.get("drill_alcaldia", "")
+        with colBack :
+            if alcaldia_sel and st.button("← Todas las alcaldías"):
+                alcaldia_sel = st.session_state["drill_alcaldia"] = ""
+
+        # KPIs of the current level
+        totals = rollup_row(rollups, alcaldia_sel)
+        st.markdown(f"#### {alcaldia_sel or 'Ciudad de México'}")
+        kpis = st.columns(4)
+        kpis[0].metric("Consumo total (m³)", f"{totals['consumo_total']:,.0f}")
+        kpis[1].metric("Inmuebles", f"{totals['total_inmuebles']:,.0f}")
+        kpis[2].metric("Hogares", f"{totals['hogares']:,.0f}")
+        kpis[3].metric(f"Reportes de falta de agua ({year_reportes})", f"{totals['reportes_falta_agua']:,.0f}")
+
+        # Clicking an alcaldía bar opens its colonias
+        fig = rollup_bars(measure, year_reportes, alcaldia_sel, "main")
+        event = st.plotly_chart(fig, use_container_width=True, on_select="rerun",
+                                selection_mode="points", key=f"drill_{alcaldia_sel}_{measure}")
+        if not alcaldia_sel and event.selection.points:
+            st.session_state["drill_alcaldia"] = event.selection.points[0]["x"]
+            st.rerun()
+
+        st.dataframe(drill_down(rollups, alcaldia_sel)[list(ROLLUP_MEASURES)]
+                     .sort_values(measure, ascending=False)
+                     .rename(columns=ROLLUP_MEASURES),
+                     use_container_width=True)
+
 # -----------------------------------------
 #               REFERENCES
 # -----------------------------------------
@@ -16,17 +16,13 @@ import streamlit as st
 # --------------------
 # Data management
 import pandas as pd
-import numpy as np
 
-# Treemap visualization
-import plotly.graph_objects as go
-# To make spatial data
-from scipy.spatial import cKDTree
-import geopandas as gpd
-
-import duckdb
-from huggingface_hub import hf_hub_url
-from shapely.geometry import Polygon, MultiPolygon
+from utils.cache import show_cache_stats
+from utils.data import REPO_ID, load_many, load_report_counts, shared_dataset
+from utils.figures import build_many
+from utils.reports import (EXPLORER_IDW, GRID_SIZES, METRIC_LABELS, PREVIEW_GRID_SIZE, REPORT_MAPS,
+                           REPORTES_FILE, colonia_report_map, report_animation, report_change_map, report_cube, report_extent,
+                           report_map, report_points_map, tune_idw)
 import textwrap
 
 # Configure warnings to keep the output clean.
@@ -36,69 +32,23 @@ warnings.filterwarnings("ignore")
 # Functions
 # ------------------------------------------------------------------------------
 
-# Cache the connection (resource-level)
-@st.cache_resource
-def get_con():
-    con = duckdb.connect()
-    con.execute("INSTALL httpfs; LOAD httpfs;")
-    return con
-
-# Cache the data (data-level)
-@st.cache_data(ttl=6*3600, show_spinner="Cargando datos de reportes de agua...")
-def load_datasets(repo_id: str, filename: str, revision: str = "main"):
-    # Build a stable CDN URL (supports HTTP range properly)
-    url = hf_hub_url(
-        repo_id=repo_id,
-        filename=filename,
-        repo_type="dataset",
-        revision=revision,
-    )
-    con = get_con()
-    # Use parameter binding so the SQL text stays stable for caching
-    return con.execute("SELECT * FROM read_parquet($url)", {"url": url}).df()
-        
 # Helper: tidy/wrap long labels so they don't overflow tiles
 def wrap_label(s, width=18):
     if pd.isna(s):
         return s
     return "<br>".join(textwrap.fill(str(s), width=width).split("\n"))
 
-def idw_interpolation(xy_known, values_known, xy_grid, power=2, k=3):
-    """
-    xy_known: (N, 2) array of known [lon, lat]
-    values_known: (N,) array of known values
-    xy_grid: (M, 2) array of grid [lon, lat]
-    power: IDW power (2 is common)
-    k: number of nearest neighbors to use
-    """
-    tree = cKDTree(xy_known)
-    dists, idxs = tree.query(xy_grid, k=k)
-    
-    dists[dists == 0] = 1e-10  # avoid division by zero
-    weights = 1 / dists**power
-    weights /= weights.sum(axis=1, keepdims=True)
-
-    interpolated = np.sum(values_known[idxs] * weights, axis=1)
-    return interpolated
-
 # ------------------------------------------------------------------------------
 # LOADING DATA
 # ------------------------------------------------------------------------------
 
-reportes = load_datasets(
-    repo_id="danielmlvz/water-dashboard",
-    filename="reportes/part-0.parquet",
-    revision="main",
-)
-
-habCons = load_datasets(
-    repo_id="danielmlvz/water-dashboard",
-    filename="habCons/part-0.parquet",
-    revision="main",
-)
-habCons["geometry"] = gpd.GeoSeries.from_wkt(habCons["geometry"])
-habCons = gpd.GeoDataFrame(habCons, geometry="geometry")
-habCons = habCons.set_crs(epsg=4326, inplace=True)
+# Warm the caches the report helpers read from: both datasets are fetched
+# concurrently, and the reportes groupby runs inside DuckDB so only the
+# aggregated counts are materialized
+load_many({
+    "reportes": (load_report_counts, REPO_ID, REPORTES_FILE, "main"),
+    "habCons": (shared_dataset, "habCons", "main"),
+})
 
 # ------------------------------------------------------------------------------
 # PAGE INFORMATION
@@ -115,345 +65,174 @@ st.markdown("# Reportes de Agua en la Ciudad de México")
 st.markdown(
     """
     <p  style='color:grey; font-size:13px;margin-bottom:0px;'>
-        El raster map fue creado utilizando Inverse Distance Weighting, el cual 
-        es un método determinista que ayuda a estimar valores desconocidos en 
-        un grid, asignándole mayor influencia a aquellos puntos conocidos 
-        más cercanos.
+        Cada mapa puede usar uno de dos métodos. IDW uniforme (Inverse Distance
+        Weighting) es un método determinista que estima valores desconocidos
+        en un grid, asignándole mayor influencia a aquellos puntos conocidos
+        más cercanos. Densidad de reportes (KDE) suaviza los reportes con un
+        kernel gaussiano y muestra su intensidad por zona.
     </p>
     <p style='color:black; font-size:13px;margin-bottom:0px;'>
-    Heads up, tarda ~1 min en cargar los mapas.
+    Mientras se calculan los mapas IDW se muestra primero una versión de menor
+    resolución.
     </p>
     """,
     unsafe_allow_html=True
 )
 
 st.sidebar.markdown("# Reportes de Agua en la Ciudad de México")
+show_cache_stats()
 
 
-reports_count_p_y_m = reportes.groupby(by=['year', 'alcaldia', 'colonia', 'latitud', 'longitud', 'reporte']).size().reset_index(name='report_count')
-pivot_all = reports_count_p_y_m.pivot_table(index=['year', 'alcaldia', 'colonia', 'latitud', 'longitud'], columns='reporte', values='report_count')
+col1Reportes, col2Reportes = st.columns([2,2])
 
-df_all = pivot_all.copy()
-keep = ['Fuga', 'Falta de agua']
-df_all['Otro'] = df_all.drop(columns=keep).sum(axis=1)
+# Engine of each map: IDW on every node, or an FFT kernel density (report
+# intensity, milliseconds whatever k)
+MODE_LABELS = {
+    "uniform": "IDW uniforme",
+    "kde": "Densidad de reportes (KDE)",
+}
 
-df_all = df_all[keep + ['Otro']]
+# ------------------------------
+#        MAPA DE FUGAS
+# ------------------------------
+with col1Reportes :     
+    mode1 = st.selectbox("Método", options=list(GRID_SIZES), format_func=MODE_LABELS.get, key="mode1")
+    slot1 = st.empty()
 
-df_all.reset_index(inplace=True)
-df_all.fillna(0, inplace=True)
+# ------------------------------
+#        MAPA DE FUGAS
+# ------------------------------
 
-# Rename for clarity
-df_all = df_all.rename(columns={
-    'latitud': 'latitude',
-    'longitud': 'longitude',
-    'Falta de agua': 'falta_agua_count',
-    'Fuga': 'fuga_count',
-    'Otro': 'otro_count'    
+with col2Reportes : 
+    mode2 = st.selectbox("Método", options=list(GRID_SIZES), format_func=MODE_LABELS.get, key="mode2")
+    slot2 = st.empty()
+
+slots = dict(zip(REPORT_MAPS, (slot1, slot2)))
+modes = dict(zip(REPORT_MAPS, (mode1, mode2)))
+
+# IDW maps not cached yet are first drawn from a coarse grid (seconds), then
+# swapped for the full-resolution ones once built
+pending = [params for params in REPORT_MAPS
+           if modes[params] != "kde"
+           and report_map.peek(*params, GRID_SIZES[modes[params]], modes[params], "main") is None]
+if pending:
+    previews = build_many({
+        params: (report_map, *params, PREVIEW_GRID_SIZE, "uniform", "main")
+        for params in pending
+    })
+    for params, fig in previews.items():
+        slots[params].plotly_chart(fig, use_container_width=True, key=f"preview_{params}")
+
+# Both maps are built concurrently, then shown in layout order. Charts are
+# keyed: two views with the same parameters share one cached figure, which
+# would otherwise give them the same element id
+maps = build_many({
+    params: (report_map, *params, GRID_SIZES[modes[params]], modes[params], "main")
+    for params in REPORT_MAPS
 })
+for params, fig in maps.items():
+    slots[params].plotly_chart(fig, use_container_width=True, key=f"top_{params}")
 
-# Data Set creation
-df_falta_agua_2022 = df_all[(df_all['year'] == 2022)] 
-df_falta_agua_2024 = df_all[(df_all['year'] == 2024)] 
-
-# For mexico city map (neighborhoods included)
-temp_copy = habCons[['geometry', 'alcaldia', 'colonia']]
-minx, miny, maxx, maxy = temp_copy.total_bounds
+# ------------------------------
+#     EXPLORA LOS REPORTES
+# ------------------------------
 
-# General Grid to interpolate over
-grid_lon = np.linspace(minx, maxx, 200)
-grid_lat = np.linspace(miny, maxy, 200)
+# Any year and report type, sliced from the cached count cube (the type and
+# method also apply to the change map below)
+st.markdown("---")
+cube = report_cube(revision="main")
+colYear, colMetric, colMode = st.columns([1,1,1])
+with colYear :
+    year = st.selectbox("Año", options=[int(y) for y in cube.years], index=len(cube.years) - 1)
+with colMetric :
+    metric = st.selectbox("Tipo de reporte", options=list(METRIC_LABELS), format_func=METRIC_LABELS.get)
+with colMode :
+    mode = st.selectbox("Método", options=list(GRID_SIZES), format_func=MODE_LABELS.get,
+                        index=list(GRID_SIZES).index("kde"), key="mode_explorer")
+
+st.metric(f"Reportes de {METRIC_LABELS[metric]} en {year}", f"{int(cube.metric(metric, year).sum()):,}")
+fig = report_map(year, metric, *EXPLORER_IDW, GRID_SIZES[mode], mode, "main")
+st.plotly_chart(fig, use_container_width=True, key="explorer")
 
-grid_lon_mesh, grid_lat_mesh = np.meshgrid(grid_lon, grid_lat)
-grid_points = np.c_[grid_lon_mesh.ravel(), grid_lat_mesh.ravel()]
+# ------------------------------
+#     REPORTES INDIVIDUALES
+# ------------------------------
 
-col1Reportes, col2Reportes = st.columns([2,2])
+# Every report of the selected year and type, binned on the server at the
+# current extent: selecting an area re-bins it at full resolution
+st.markdown("---")
+full_extent = report_extent(revision="main")
+extent = st.session_state.setdefault("points_extent", full_extent)
+if st.button("Restablecer vista", disabled=extent == full_extent):
+    extent = st.session_state["points_extent"] = full_extent
+fig = report_points_map(year, metric, extent, "main")
+# One chart per extent, so a new view starts without a selection
+event = st.plotly_chart(fig, use_container_width=True, on_select="rerun",
+                        selection_mode="box", key=f"points_{extent}")
+for box in event.selection.box:
+    (x0, x1), (y0, y1) = sorted(box["x"]), sorted(box["y"])
+    if x1 > x0 and y1 > y0:
+        st.session_state["points_extent"] = tuple(round(v, 5) for v in (x0, y0, x1, y1))
+        st.rerun()
 
 # ------------------------------
-#        MAPA DE FUGAS
+#     REPORTES POR COLONIA
 # ------------------------------
-with col1Reportes :     
-    df_to_use = df_falta_agua_2022
-    value_to_use = 'falta_agua_count'
-
-    # Known points
-    xy_known = df_to_use[['longitude', 'latitude']].values
-    z_known = df_to_use[value_to_use].values 
-
-    # Grid Already Created, then we go to interpolation directly
-    z_idw_flat = idw_interpolation(xy_known, z_known, grid_points, power=0.7, k=200)
-    z_idw = z_idw_flat.reshape(grid_lat_mesh.shape)
-    
-    # Ensure same CRS
-    if getattr(habCons, "crs", None) != "EPSG:4326":
-        habCons = habCons.to_crs("EPSG:4326")
-    if getattr(temp_copy, "crs", None) != "EPSG:4326":
-        temp_copy = temp_copy.to_crs("EPSG:4326")
-
-    # --- your existing interpolation result: z_idw, grid_lon_mesh, grid_lat_mesh ---
-
-    # Flatten the grid for plotting points (we’ll mask outside polygon early for speed)
-    grid_df = pd.DataFrame({
-        'lon': grid_lon_mesh.ravel(),
-        'lat': grid_lat_mesh.ravel(),
-        'value': z_idw.ravel()
-    })
 
-    # Build GeoDataFrame & spatial mask using unary_union
-    cdmx_union = habCons.unary_union  # Polygon/MultiPolygon of CDMX
-    grid_gdf = gpd.GeoDataFrame(
-        grid_df,
-        geometry=gpd.points_from_xy(grid_df['lon'], grid_df['lat']),
-        crs="EPSG:4326"
-    )
-
-    # Efficient spatial mask (predicates need shapely>=2)
-    mask_inside = grid_gdf.geometry.within(cdmx_union)
-    grid_inside = grid_df[mask_inside].copy()
-
-    # Optional: smooth colorbar range with robust min/max (ignore outliers)
-    vmin = np.nanpercentile(grid_inside['value'], 2)
-    vmax = np.nanpercentile(grid_inside['value'], 98)
-
-    # --- figure ---
-    fig = go.Figure()
-
-    # 1) Raster points (use Scattergl for speed with many points)
-    fig.add_trace(go.Scattergl(
-        x=grid_inside['lon'],
-        y=grid_inside['lat'],
-        mode='markers',
-        marker=dict(
-            size=4,
-            opacity=0.9,
-            color=np.clip(grid_inside['value'], vmin, vmax),
-            colorscale='Viridis',  # perceptually uniform
-            cmin=vmin,
-            cmax=vmax,
-            colorbar=dict(
-                title='Interpolated intensity',
-                titleside='right',
-                thickness=14,
-                len=0.8,
-                ticks='outside'
-            )
-        ),
-        hovertemplate=(
-            "Value: %{marker.color:.2f}<br>"
-            "Lon: %{x:.5f}<br>"
-            "Lat: %{y:.5f}<extra></extra>"
-        ),
-        showlegend=False,
-        name='IDW'
-    ))
-
-    # 2) Add CDMX boundary (stroke)
-    def _add_poly_outline(geometry, line_color='black', line_width=0.8):
-        if isinstance(geometry, Polygon):
-            x, y = geometry.exterior.xy
-            fig.add_trace(go.Scatter(
-                x=list(x), y=list(y),
-                mode='lines',
-                line=dict(color=line_color, width=line_width),
-                showlegend=False,
-                hoverinfo='skip'
-            ))
-        elif isinstance(geometry, MultiPolygon):
-            for poly in geometry.geoms:
-                _add_poly_outline(poly, line_color=line_color, line_width=line_width)
-
-    # Outlines from your temp_copy geometries (alcaldías/colonias)
-    for geom in temp_copy['geometry']:
-        if geom is not None:
-            _add_poly_outline(geom, line_color='rgba(0,0,0,0.5)', line_width=0.6)
-
-    # 3) Soft fill for the whole CDMX union (nice focus effect)
-    def _add_poly_fill(geometry, fillcolor='rgba(0,0,0,0.05)'):
-        if isinstance(geometry, Polygon):
-            x, y = geometry.exterior.xy
-            fig.add_trace(go.Scatter(
-                x=list(x), y=list(y),
-                mode='lines',
-                fill='toself',
-                fillcolor=fillcolor,
-                line=dict(color='rgba(0,0,0,0.75)', width=1),
-                hoverinfo='skip',
-                showlegend=False
-            ))
-        elif isinstance(geometry, MultiPolygon):
-            for poly in geometry.geoms:
-                _add_poly_fill(poly, fillcolor=fillcolor)
-
-    _add_poly_fill(cdmx_union, fillcolor='rgba(0,0,0,0.04)')
-
-    # 4) Layout tweaks: equal aspect, subtle grid, margins, title
-    fig.update_layout(
-        title=dict(
-            text="Zonas con más reportes de falta de agua - 2022",
-            x=0.02, xanchor='left', y=0.98
-        ),
-        width=900, height=1000,
-        margin=dict(l=10, r=10, t=50, b=10),
-    )
+# Reports assigned to the habCons colonias by their coordinates (cached
+# spatial join), as a rate per 1,000 households
+st.markdown("---")
+fig = colonia_report_map(year, metric, "main")
+st.plotly_chart(fig, use_container_width=True, key="colonias")
 
-    # Equal aspect so geography isn’t distorted
-    fig.update_xaxes(
-        title_text='Longitude',
-        showgrid=True, gridcolor='rgba(0,0,0,0.08)',
-        zeroline=False
-    )
-    fig.update_yaxes(
-        title_text='Latitude',
-        showgrid=True, gridcolor='rgba(0,0,0,0.08)',
-        scaleanchor='x', scaleratio=1,
-        zeroline=False
-    )
+# ------------------------------
+#        MAPA DE CAMBIO
+# ------------------------------
 
-    # In Streamlit
-    st.plotly_chart(fig, use_container_width=True)
+# Both years are interpolated with the same grid and parameters (cached
+# rasters), so their difference has a meaningful, zero-centred scale
+st.markdown("---")
+years = [int(y) for y in cube.years]
+colFrom, colTo, colKind = st.columns([1,1,1])
+with colFrom :
+    year_a = st.selectbox("Desde", options=years, index=years.index(REPORT_MAPS[0][0]) if REPORT_MAPS[0][0] in years else 0)
+with colTo :
+    year_b = st.selectbox("Hasta", options=years, index=years.index(REPORT_MAPS[1][0]) if REPORT_MAPS[1][0] in years else len(years) - 1)
+with colKind :
+    kind = st.radio("Cambio", options=["difference", "ratio"],
+                    format_func={"difference": "Diferencia", "ratio": "Razón (log₂)"}.get, horizontal=True)
+
+fig = report_change_map(year_a, year_b, metric, *EXPLORER_IDW, GRID_SIZES[mode], mode, kind, "main")
+st.plotly_chart(fig, use_container_width=True, key="change")
 
 # ------------------------------
-#        MAPA DE FUGAS
+#     REPRODUCCIÓN POR AÑO
 # ------------------------------
 
-with col2Reportes : 
-    df_to_use = df_falta_agua_2024
-    value_to_use = 'falta_agua_count'
-
-    # Known points
-    xy_known = df_to_use[['longitude', 'latitude']].values
-    z_known = df_to_use[value_to_use].values  # or 'falta de agua'
-
-    # Grid Already Created, then we go to interpolation directly
-    z_idw_flat = idw_interpolation(xy_known, z_known, grid_points, power=0.8, k=40)
-    z_idw = z_idw_flat.reshape(grid_lat_mesh.shape)
-
-    # Ensure same CRS
-    if getattr(habCons, "crs", None) != "EPSG:4326":
-        habCons = habCons.to_crs("EPSG:4326")
-    if getattr(temp_copy, "crs", None) != "EPSG:4326":
-        temp_copy = temp_copy.to_crs("EPSG:4326")
-
-    # --- your existing interpolation result: z_idw, grid_lon_mesh, grid_lat_mesh ---
-
-    # Flatten the grid for plotting points (we’ll mask outside polygon early for speed)
-    grid_df = pd.DataFrame({
-        'lon': grid_lon_mesh.ravel(),
-        'lat': grid_lat_mesh.ravel(),
-        'value': z_idw.ravel()
-    })
+# Every year of the selected type and method on one map: the years are
+# interpolated once as a batch and the browser only swaps the colour codes
+st.markdown("---")
+if st.toggle("Reproducir todos los años", value=False):
+    fig = report_animation(metric, *EXPLORER_IDW, GRID_SIZES[mode], mode, "main")
+    st.plotly_chart(fig, use_container_width=True, key="animation")
 
-    # Build GeoDataFrame & spatial mask using unary_union
-    cdmx_union = habCons.unary_union  # Polygon/MultiPolygon of CDMX
-    grid_gdf = gpd.GeoDataFrame(
-        grid_df,
-        geometry=gpd.points_from_xy(grid_df['lon'], grid_df['lat']),
-        crs="EPSG:4326"
-    )
+# ------------------------------
+#     AJUSTE DE PARÁMETROS IDW
+# ------------------------------
 
-    # Efficient spatial mask (predicates need shapely>=2)
-    mask_inside = grid_gdf.geometry.within(cdmx_union)
-    grid_inside = grid_df[mask_inside].copy()
-
-    # Optional: smooth colorbar range with robust min/max (ignore outliers)
-    vmin = np.nanpercentile(grid_inside['value'], 2)
-    vmax = np.nanpercentile(grid_inside['value'], 98)
-
-    # --- figure ---
-    fig = go.Figure()
-
-    # 1) Raster points (use Scattergl for speed with many points)
-    fig.add_trace(go.Scattergl(
-        x=grid_inside['lon'],
-        y=grid_inside['lat'],
-        mode='markers',
-        marker=dict(
-            size=4,
-            opacity=0.9,
-            color=np.clip(grid_inside['value'], vmin, vmax),
-            colorscale='Viridis',  # perceptually uniform
-            cmin=vmin,
-            cmax=vmax,
-            colorbar=dict(
-                title='Interpolated intensity',
-                titleside='right',
-                thickness=14,
-                len=0.8,
-                ticks='outside'
+# Leave-one-out validation of the hand-picked (power, k) of each map
+if st.toggle("Comparar parámetros IDW (validación cruzada)", value=False):
+    for column, (year, metric, power, k) in zip(st.columns([2,2]), REPORT_MAPS):
+        with column:
+            tuning = tune_idw(year, metric, revision="main")
+            current = tuning[(tuning["power"] == power) & (tuning["k"] == k)]["rmse"].iloc[0]
+            best = tuning.iloc[0]
+            st.markdown(
+                f"**{year}** · actual: power={power}, k={k} → RMSE {current:.3f}<br>"
+                f"mejor: power={best['power']}, k={int(best['k'])} → RMSE {best['rmse']:.3f}",
+                unsafe_allow_html=True
             )
-        ),
-        hovertemplate=(
-            "Value: %{marker.color:.2f}<br>"
-            "Lon: %{x:.5f}<br>"
-            "Lat: %{y:.5f}<extra></extra>"
-        ),
-        showlegend=False,
-        name='IDW'
-    ))
-
-    # 2) Add CDMX boundary (stroke)
-    def _add_poly_outline(geometry, line_color='black', line_width=0.8):
-        if isinstance(geometry, Polygon):
-            x, y = geometry.exterior.xy
-            fig.add_trace(go.Scatter(
-                x=list(x), y=list(y),
-                mode='lines',
-                line=dict(color=line_color, width=line_width),
-                showlegend=False,
-                hoverinfo='skip'
-            ))
-        elif isinstance(geometry, MultiPolygon):
-            for poly in geometry.geoms:
-                _add_poly_outline(poly, line_color=line_color, line_width=line_width)
-
-    # Outlines from your temp_copy geometries (alcaldías/colonias)
-    for geom in temp_copy['geometry']:
-        if geom is not None:
-            _add_poly_outline(geom, line_color='rgba(0,0,0,0.5)', line_width=0.6)
-
-    # 3) Soft fill for the whole CDMX union (nice focus effect)
-    def _add_poly_fill(geometry, fillcolor='rgba(0,0,0,0.05)'):
-        if isinstance(geometry, Polygon):
-            x, y = geometry.exterior.xy
-            fig.add_trace(go.Scatter(
-                x=list(x), y=list(y),
-                mode='lines',
-                fill='toself',
-                fillcolor=fillcolor,
-                line=dict(color='rgba(0,0,0,0.75)', width=1),
-                hoverinfo='skip',
-                showlegend=False
-            ))
-        elif isinstance(geometry, MultiPolygon):
-            for poly in geometry.geoms:
-                _add_poly_fill(poly, fillcolor=fillcolor)
-
-    _add_poly_fill(cdmx_union, fillcolor='rgba(0,0,0,0.04)')
-
-    # 4) Layout tweaks: equal aspect, subtle grid, margins, title
-    fig.update_layout(
-        title=dict(
-            text="Zonas con más reportes de falta de agua - 2024",
-            x=0.02, xanchor='left', y=0.98
-        ),
-        width=900, height=1000,
-        margin=dict(l=10, r=10, t=50, b=10),
-    )
-
-    # Equal aspect so geography isn’t distorted
-    fig.update_xaxes(
-        title_text='Longitude',
-        showgrid=True, gridcolor='rgba(0,0,0,0.08)',
-        zeroline=False
-    )
-    fig.update_yaxes(
-        title_text='Latitude',
-        showgrid=True, gridcolor='rgba(0,0,0,0.08)',
-        scaleanchor='x', scaleratio=1,
-        zeroline=False
-    )
-
-    # In Streamlit
-    st.plotly_chart(fig, use_container_width=True)   
+            st.dataframe(tuning.head(10), hide_index=True, use_container_width=True)
 
 # -----------------------------------------
 #               REFERENCES
@@ -0,0 +1,4 @@
+"""
+Shared helpers for the Dashboard pages (data loading, caching and spatial).
+Author: Daniel Malváez
+"""
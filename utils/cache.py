@@ -0,0 +1,402 @@
+"""
+Caching for the Dashboard: memoization keyed on dataset tokens, so cached
+helpers that take frames never hash the whole frame to build their key.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# Standard library imports.
+import functools
+import hashlib
+import inspect
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Streamlit import
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# --------------------
+# Third Party Imports
+# --------------------
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import shapely
+from scipy.spatial import cKDTree
+
+# ------------------------------------------------------------------------------
+# Dataset tokens
+# ------------------------------------------------------------------------------
+
+# id(frame) -> (weak reference to the frame, token)
+_tokens: dict[int, tuple] = {}
+_tokens_lock = threading.Lock()
+
+def tag(frame, *token):
+    """
+    Attach a (dataset id, revision, parameters...) token to a frame so cached
+    functions can key on it in O(1). Frames derived from it (filters, merges)
+    are new objects and carry no token.
+    """
+    key = id(frame)
+
+    def _forget(ref):
+        with _tokens_lock:
+            if _tokens.get(key, (None,))[0] is ref:
+                del _tokens[key]
+
+    with _tokens_lock:
+        _tokens[key] = (weakref.ref(frame, _forget), token)
+    return frame
+
+def token_of(frame) -> tuple | None:
+    entry = _tokens.get(id(frame))
+    if entry is None or entry[0]() is not frame:
+        return None
+    # Cheap structural fingerprint: catches columns added or re-typed in place
+    if isinstance(frame, pd.DataFrame):
+        layout = tuple(zip(frame.columns, map(str, frame.dtypes)))
+    else:
+        layout = ((frame.name, str(frame.dtype)),)
+    return entry[1] + (len(frame), layout)
+
+def _key_part(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        token = token_of(value)
+        if token is not None:
+            return ("token",) + token
+        # Untagged frames fall back to hashing their content (O(rows)): the
+        # digest follows row order, and the layout keeps column names and dtypes
+        if isinstance(value, pd.DataFrame):
+            layout = tuple(zip(map(str, value.columns), map(str, value.dtypes)))
+        else:
+            layout = ((str(value.name), str(value.dtype)),)
+        rows = pd.util.hash_pandas_object(value, index=True).to_numpy()
+        return ("hash", layout, hashlib.blake2b(rows.tobytes(), digest_size=16).hexdigest())
+    if isinstance(value, (list, tuple)):
+        return tuple(_key_part(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _key_part(v)) for k, v in value.items()))
+    hash(value)  # parameters must be hashable
+    return value
+
+def _freeze(value):
+    # Cached arrays are shared between sessions: make accidental writes fail
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, tuple):
+        for item in value:
+            _freeze(item)
+    return value
+
+# ------------------------------------------------------------------------------
+# Memory accounting
+# ------------------------------------------------------------------------------
+
+# Bytes every `cached` function may hold together before the least recently
+# used entries are evicted
+CACHE_BUDGET = 512 * 2**20
+
+def estimate_size(value) -> int:
+    """Approximate bytes held by a cached value."""
+    if isinstance(value, pd.DataFrame):
+        size = int(value.memory_usage(index=True, deep=True).sum())
+        # Shapely geometries only count their pointers in memory_usage
+        for col, dtype in value.dtypes.items():
+            if getattr(dtype, "name", None) == "geometry":
+                size += int(shapely.get_num_coordinates(value[col].values).sum()) * 16
+        return size
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (np.ndarray, pa.Table, pa.RecordBatch)):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, cKDTree):
+        # Points and their permutation, plus the nodes (~ 64 bytes each)
+        return int(value.data.nbytes + value.indices.nbytes + 64 * value.size)
+    # Objects holding arrays (e.g. the report cube) report their own size
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(value)
+
+class _Budget:
+    """Global byte count and LRU order of the entries of every cache."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.bytes = 0
+        self.lock = threading.RLock()
+        self._lru: OrderedDict = OrderedDict()  # (cache, key) -> size
+
+    def add(self, cache, key, size: int):
+        self._lru[(cache, key)] = size
+        self.bytes += size
+
+    def touch(self, cache, key):
+        self._lru.move_to_end((cache, key))
+
+    def remove(self, cache, key):
+        self.bytes -= self._lru.pop((cache, key))
+
+    def enforce(self):
+        # The newest entry is always kept, even if it alone exceeds the budget
+        while self.bytes > self.limit and len(self._lru) > 1:
+            cache, key = next(iter(self._lru))
+            cache.evict(key)
+
+_budget = _Budget(CACHE_BUDGET)
+_caches: dict[str, "_Cache"] = {}
+
+def set_cache_budget(limit: int) -> None:
+    with _budget.lock:
+        _budget.limit = limit
+        _budget.enforce()
+
+def cache_stats() -> dict:
+    """
+    Counters of every cache (hits, misses, evictions, bytes, entries) and the
+    global byte total, to size containers from real usage.
+    """
+    with _budget.lock:
+        stats = {name: cache.stats() for name, cache in _caches.items()}
+        stats["_total"] = {"bytes": _budget.bytes, "budget": _budget.limit}
+        return stats
+
+def show_cache_stats() -> None:
+    """Sidebar table of `cache_stats()` on pages opened with `?debug=cache`."""
+    if st.query_params.get("debug") != "cache":
+        return
+    stats = cache_stats()
+    total = stats.pop("_total")
+    table = pd.DataFrame.from_dict(stats, orient="index").sort_values("bytes", ascending=False)
+    table["MiB"] = table.pop("bytes") / 2**20
+    with st.sidebar.expander("Caché", expanded=True):
+        st.metric("En memoria", f"{total['bytes'] / 2**20:,.1f} MiB",
+                  help=f"Presupuesto: {total['budget'] / 2**20:,.0f} MiB")
+        st.dataframe(table.round(1))
+
+# ------------------------------------------------------------------------------
+# Cache
+# ------------------------------------------------------------------------------
+
+class _Cache:
+    """LRU mapping with optional TTL and entry limit, under the global budget."""
+
+    def __init__(self, name: str, ttl: float | None = None, max_entries: int | None = None,
+                 source: str = ""):
+        self.name = name
+        self.source = source  # hash of the decorated function's code
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()  # key -> (value, stored_at, size)
+        self.hits = self.misses = self.evictions = 0
+        self.bytes = 0
+        self.flight = SingleFlight()
+        _caches[name] = self
+
+    def get(self, key, count: bool = True):
+        with _budget.lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += count
+                return False, None
+            self.hits += count
+            self._data.move_to_end(key)
+            _budget.touch(self, key)
+            return True, entry[0]
+
+    def count(self, hit: bool):
+        with _budget.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def set(self, key, value):
+        size = estimate_size(value)
+        with _budget.lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.monotonic(), size)
+            self.bytes += size
+            _budget.add(self, key, size)
+            while self.max_entries is not None and len(self._data) > self.max_entries:
+                self.evict(next(iter(self._data)))
+            _budget.enforce()
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self.bytes -= size
+        _budget.remove(self, key)
+
+    def evict(self, key):
+        self._remove(key)
+        self.evictions += 1
+
+    def clear(self):
+        with _budget.lock:
+            for key in list(self._data):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.bytes,
+            "entries": len(self._data),
+        }
+
+# Result handed to the waiters when the leader was interrupted (a Streamlit
+# rerun or stop, KeyboardInterrupt...): they retry and one of them leads
+_RETRY = object()
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one computation: the
+    first caller runs it, the others wait for and share its result or its
+    error. Script-control exceptions (BaseException) belong to the caller's
+    own session and are never shared: the waiters retry instead.
+    """
+
+    def __init__(self):
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = Future()
+            if leader:
+                break
+            value = call.result()
+            if value is not _RETRY:
+                return value
+
+        try:
+            value = fn()
+        except Exception as exc:
+            self._finish(key, call, exc=exc)
+            raise
+        except BaseException:
+            self._finish(key, call, value=_RETRY)
+            raise
+        self._finish(key, call, value=value)
+        return value
+
+    def _finish(self, key, call: Future, value=None, exc: Exception | None = None):
+        # Forget the call before waking the waiters, so a retry starts a new one
+        with self._lock:
+            del self._calls[key]
+        if exc is not None:
+            call.set_exception(exc)
+        else:
+            call.set_result(value)
+
+def _source_hash(func) -> str:
+    try:
+        return hashlib.md5(inspect.getsource(func).encode()).hexdigest()
+    except (OSError, TypeError):
+        return ""
+
+def cached(ttl: float | None = None, max_entries: int | None = None,
+           show_spinner: bool | str = False, pin=None, name: str | None = None):
+    """
+    Memoize a function on (dataset token, revision, parameters).
+    Tagged frames are keyed by their token, other arguments by value (defaults
+    included, so positional and keyword calls share entries). Results are
+    shared by every caller and must be treated as read-only; frame results are
+    tagged so they can feed other cached functions.
+    pin: optional callable mapping the `revision` argument to the commits the
+    result depends on; they are added to the key, so a new upstream commit of
+    those files (and only those) invalidates the entry.
+    Concurrent misses on the same key are computed once (single-flight).
+    name: cache name (defaults to module.qualname). Functions decorated again
+    with the same name and source, as page scripts do on every rerun, keep
+    using the same cache.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        cache_name = name or f"{func.__module__}.{func.__qualname__}"
+        source = _source_hash(inspect.unwrap(func))
+        with _budget.lock:
+            cache = _caches.get(cache_name)
+            if cache is None or cache.source != source:
+                if cache is not None:
+                    cache.clear()
+                cache = _Cache(cache_name, ttl, max_entries, source)
+        flight = cache.flight
+
+        def make_key(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple((arg, _key_part(value)) for arg, value in bound.arguments.items())
+            if pin is not None:
+                key += (("pin", pin(bound.arguments["revision"])),)
+            return key
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            hit, value = cache.get(key, count=False)
+            if hit:
+                cache.count(hit=True)
+                return value
+
+            # Callers that wait on another caller's computation count as hits:
+            # only the computation itself is a miss
+            led = []
+
+            def compute():
+                led.append(True)
+                # A previous leader may have stored it while we were queued
+                hit, value = cache.get(key, count=False)
+                if hit:
+                    cache.count(hit=True)
+                    return value
+                cache.count(hit=False)
+                value = func(*args, **kwargs)
+                if isinstance(value, (pd.DataFrame, pd.Series)):
+                    tag(value, cache_name, key)
+                cache.set(key, _freeze(value))
+                return value
+
+            def run():
+                value = flight.do(key, compute)
+                if not led:
+                    cache.count(hit=True)
+                return value
+
+            if show_spinner and get_script_run_ctx(suppress_warning=True) is not None:
+                text = show_spinner if isinstance(show_spinner, str) else "Calculando…"
+                with st.spinner(text):
+                    return run()
+            return run()
+
+        def peek(*args, **kwargs):
+            """Cached result for these arguments, or None; never computes."""
+            hit, value = cache.get(make_key(args, kwargs), count=False)
+            return value if hit else None
+
+        wrapper.clear = cache.clear
+        wrapper.peek = peek
+        return wrapper
+    return decorator
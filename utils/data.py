@@ -0,0 +1,274 @@
+"""
+Data layer for the Dashboard: DuckDB access to the Hugging Face dataset.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# Standard library imports.
+import atexit
+import os
+import threading
+import time
+from pathlib import Path
+
+# Streamlit import
+import streamlit as st
+
+# --------------------
+# Third Party Imports
+# --------------------
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import shapely
+import geopandas as gpd
+from huggingface_hub import hf_hub_url
+
+from utils.cache import cached, tag
+from utils.parallel import run_threads
+from utils.revisions import is_commit, resolve_revision
+
+# ------------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------------
+
+REPO_ID = "danielmlvz/water-dashboard"
+
+# App-wide DuckDB database holding local copies of the source tables
+DB_PATH = Path(__file__).resolve().parent.parent / ".cache" / "water.duckdb"
+
+# Seconds before a local copy of a branch is refreshed from Hugging Face. Copies
+# pinned to a commit never expire; branches are only used when the revision
+# cannot be resolved (see utils.revisions).
+SOURCE_TTL = 6*3600
+
+# Coordinates of a report location in the reportes dataset
+REPORT_COORDS = ("longitud", "latitud")
+
+# Datasets shared (read-only) by the pages. `crs` marks a WKT geometry column
+# in that CRS and `to_crs` the CRS the pages work in.
+DATASETS = {
+    "drought": {"filename": "drought/part-0.parquet", "crs": 4326},
+    "consumo19": {"filename": "consumo19/part-0.parquet"},
+    "densidadHogares": {"filename": "densidadHogares/part-0.parquet", "crs": 32614, "to_crs": 4326},
+    "habCons": {"filename": "habCons/part-0.parquet", "crs": 4326},
+    "factibilidad": {"filename": "factibilidad/part-0.parquet", "crs": 4326},
+}
+
+# Copy-on-Write (the default from pandas 3) lets the pages modify shallow
+# copies of the shared frames without touching the cached instance
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# ------------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------------
+
+def _connect() -> duckdb.DuckDBPyConnection:
+    # DuckDB lets one process write a database file at a time. Further
+    # processes (another `streamlit run`, a worker) get a database of their
+    # own, removed when they exit: they work, but refetch their sources
+    try:
+        return duckdb.connect(str(DB_PATH))
+    except duckdb.IOException:
+        path = DB_PATH.with_name(f"{DB_PATH.stem}-{os.getpid()}{DB_PATH.suffix}")
+        con = duckdb.connect(str(path))
+
+        def _drop():
+            con.close()
+            for leftover in (path, path.with_name(path.name + ".wal")):
+                leftover.unlink(missing_ok=True)
+
+        atexit.register(_drop)
+        return con
+
+# Cache the connection (resource-level): one database for the whole app,
+# extensions are installed and loaded only here
+@st.cache_resource
+def get_con():
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    con = _connect()
+    con.execute("INSTALL httpfs; LOAD httpfs;")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS _sources (
+            name VARCHAR PRIMARY KEY,
+            url VARCHAR,
+            fetched_at DOUBLE
+        )
+    """)
+    return con
+
+_local = threading.local()
+
+def get_cursor():
+    """
+    Cursor of the calling thread. Streamlit runs every session in its own
+    thread, and a DuckDB connection must not be shared between threads.
+    """
+    cursor = getattr(_local, "cursor", None)
+    if cursor is None:
+        cursor = _local.cursor = get_con().cursor()
+    return cursor
+
+def dataset_url(repo_id: str, filename: str, revision: str = "main") -> str:
+    # Build a stable CDN URL (supports HTTP range properly)
+    return hf_hub_url(
+        repo_id=repo_id,
+        filename=filename,
+        repo_type="dataset",
+        revision=revision,
+    )
+
+def _table_name(filename: str, revision: str) -> str:
+    return f"{filename.split('/')[0]}@{revision}"
+
+def _drop_other_revisions(con, filename: str, keep: str) -> None:
+    # A newer commit of the file supersedes every older local copy
+    prefix = _table_name(filename, "")
+    stale = con.execute(
+        "SELECT name FROM _sources WHERE starts_with(name, ?) AND name <> ?",
+        [prefix, keep],
+    ).fetchall()
+    for (name,) in stale:
+        con.execute(f'DROP TABLE IF EXISTS "{name}"')
+        con.execute("DELETE FROM _sources WHERE name = ?", [name])
+
+# One lock per local table, so two sessions never copy the same source twice
+_source_locks: dict[str, threading.Lock] = {}
+_source_locks_guard = threading.Lock()
+
+def cache_source(repo_id: str, filename: str, revision: str = "main") -> str:
+    """
+    Copy a Parquet source into the local database and return the (quoted)
+    name of the local table. Copies of a commit are kept until a newer commit
+    of the same file replaces them; copies of a branch expire after SOURCE_TTL.
+    """
+    name = _table_name(filename, revision)
+    with _source_locks_guard:
+        lock = _source_locks.setdefault(name, threading.Lock())
+
+    with lock:
+        con = get_cursor()
+        expires = 0 if is_commit(revision) else time.time() - SOURCE_TTL
+        fresh = con.execute(
+            "SELECT 1 FROM _sources WHERE name = ? AND fetched_at > ?",
+            [name, expires],
+        ).fetchone()
+        if fresh is None:
+            url = dataset_url(repo_id, filename, revision)
+            con.execute(f'CREATE OR REPLACE TABLE "{name}" AS SELECT * FROM read_parquet($url)', {"url": url})
+            con.execute("INSERT OR REPLACE INTO _sources VALUES (?, ?, ?)", [name, url, time.time()])
+            if is_commit(revision):
+                _drop_other_revisions(con, filename, name)
+    return f'"{name}"'
+
+# Arrow tables are immutable, so they are cached as a resource: every caller
+# shares the same buffers instead of receiving a pickled copy. They count
+# against the global cache budget (utils.cache.CACHE_BUDGET).
+@cached(ttl=SOURCE_TTL, max_entries=12, show_spinner="Cargando datos…")
+def _load_arrow(repo_id: str, filename: str, revision: str) -> pa.Table:
+    table = cache_source(repo_id, filename, revision)
+    return get_cursor().execute(f"SELECT * FROM {table}").fetch_arrow_table()
+
+def load_arrow(repo_id: str, filename: str, revision: str = "main") -> pa.Table:
+    # Cached on the commit of the file, not on the branch name
+    return _load_arrow(repo_id, filename, resolve_revision(repo_id, filename, revision))
+
+def load_report_counts(repo_id: str, filename: str, revision: str = "main") -> tuple[pa.Table, pa.Table]:
+    return _load_report_counts(repo_id, filename, resolve_revision(repo_id, filename, revision))
+
+@cached(ttl=SOURCE_TTL, max_entries=4, show_spinner="Agregando reportes de agua…")
+def _load_report_counts(repo_id: str, filename: str, revision: str) -> tuple[pa.Table, pa.Table]:
+    """
+    Reports interned by location, with both steps pushed into DuckDB.
+    Returns the location dictionary (row i is location_id i: longitud,
+    latitud) and the report count per (year, location_id, reporte). The
+    coordinates are hashed once per commit, then everything keys on ids.
+    """
+    table = cache_source(repo_id, filename, revision)
+    con = get_cursor()
+    coords = ", ".join(f'"{c}"' for c in REPORT_COORDS)
+    # pandas' groupby skips null keys, keep the same semantics
+    locations = con.execute(
+        f"""
+        SELECT {coords}
+        FROM {table}
+        WHERE {" AND ".join(f'"{c}" IS NOT NULL' for c in REPORT_COORDS)}
+        GROUP BY ALL
+        ORDER BY ALL
+        """
+    ).fetch_arrow_table()
+    ids = locations.append_column("location_id", pa.array(range(locations.num_rows), pa.int32()))
+
+    # The dictionary is scanned in place (Arrow), not copied into the database
+    con.register("_report_locations", ids)
+    try:
+        counts = con.execute(
+            f"""
+            SELECT "year", location_id, "reporte", count(*) AS report_count
+            FROM {table} JOIN _report_locations USING ({coords})
+            WHERE "year" IS NOT NULL AND "reporte" IS NOT NULL
+            GROUP BY ALL
+            ORDER BY ALL
+            """
+        ).fetch_arrow_table()
+    finally:
+        con.unregister("_report_locations")
+    return locations, counts
+
+def load_many(jobs: dict[str, tuple]) -> dict:
+    """
+    Fetch all the datasets of a page concurrently (one thread per dataset).
+    jobs: {name: (loader, *args)}, e.g. {"habCons": (shared_dataset, "habCons", "main")}
+    Every thread gets its own cursor over the same DuckDB connection, so the
+    httpfs extension and its HTTP connections are shared.
+    """
+    # Open the shared connection once before the workers race for it
+    get_con()
+    return run_threads(jobs)
+
+def _arrow_strings(dtype: pa.DataType):
+    # Keep string columns Arrow-backed instead of copying into Python objects
+    if pa.types.is_string(dtype) or pa.types.is_large_string(dtype):
+        return pd.StringDtype("pyarrow")
+    return None
+
+def to_frame(table: pa.Table) -> pd.DataFrame:
+    """Convert an Arrow table to pandas, keeping strings in Arrow memory."""
+    return table.to_pandas(types_mapper=_arrow_strings)
+
+def decode_geometry(table: pa.Table, crs=4326, column: str = "geometry") -> gpd.GeoDataFrame:
+    """Decode the WKT column of an Arrow table straight into a GeoDataFrame."""
+    geoms = shapely.from_wkt(table.column(column).to_numpy(zero_copy_only=False))
+    frame = to_frame(table.drop_columns([column]))
+    return gpd.GeoDataFrame(frame, geometry=gpd.GeoSeries(geoms, index=frame.index), crs=crs)
+
+# One decoded instance per process, shared by every session
+@cached(ttl=SOURCE_TTL, max_entries=2*len(DATASETS), show_spinner="Preparando datos…")
+def _shared_dataset(name: str, revision: str) -> pd.DataFrame:
+    # `revision` is already resolved to the file's commit
+    spec = DATASETS[name]
+    table = load_arrow(REPO_ID, spec["filename"], revision)
+    if "crs" not in spec:
+        return to_frame(table)
+    frame = decode_geometry(table, crs=spec["crs"])
+    if "to_crs" in spec:
+        frame = frame.to_crs(spec["to_crs"])
+    return frame
+
+def shared_dataset(name: str, revision: str = "main") -> pd.DataFrame:
+    """
+    Copy-on-write view of a dataset from DATASETS. The data is held once per
+    process; columns added or modified by a page only live in its view.
+    The view is tagged with (name, commit) for the project's cached helpers.
+    """
+    revision = resolve_revision(REPO_ID, DATASETS[name]["filename"], revision)
+    return tag(_shared_dataset(name, revision).copy(deep=False), name, revision)
+
+def pins(*filenames):
+    """
+    `pin` for cached helpers: maps a revision to the commits of the source
+    files a result is derived from.
+    """
+    return lambda revision: tuple(resolve_revision(REPO_ID, f, revision) for f in filenames)
@@ -0,0 +1,73 @@
+"""
+Figure cache: Plotly figures built once per (page, chart, parameters) and
+served to every session as ready-to-send dicts.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# Standard library imports.
+import functools
+
+# --------------------
+# Third Party Imports
+# --------------------
+import plotly.graph_objects as go
+
+from utils.cache import cached
+from utils.data import pins
+from utils.parallel import run_threads
+
+# ------------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------------
+
+class CachedFigure(go.Figure):
+    """
+    Figure backed by a cached dict: st.plotly_chart only calls `to_dict`, so
+    repeat views skip building and validating the traces. Read-only.
+    """
+
+    def __init__(self, spec: dict):
+        object.__setattr__(self, "_spec", spec)
+
+    def to_dict(self) -> dict:
+        return self._spec
+
+def cached_figure(page: str, chart: str, sources: tuple[str, ...] = (),
+                  max_entries: int | None = 16):
+    """
+    Cache the figure a builder returns, keyed on page, chart and the builder's
+    parameters. Builders must take a `revision` argument when `sources`
+    (dataset filenames) are given, so a new commit of those files rebuilds it.
+    """
+    def decorator(build):
+        @cached(
+            max_entries=max_entries,
+            pin=pins(*sources) if sources else None,
+            name=f"figure:{page}/{chart}",
+        )
+        @functools.wraps(build)
+        def spec(*args, **kwargs) -> dict:
+            return build(*args, **kwargs).to_dict()
+
+        @functools.wraps(build)
+        def wrapper(*args, **kwargs) -> CachedFigure:
+            return CachedFigure(spec(*args, **kwargs))
+
+        def peek(*args, **kwargs) -> CachedFigure | None:
+            cached_spec = spec.peek(*args, **kwargs)
+            return None if cached_spec is None else CachedFigure(cached_spec)
+
+        wrapper.clear = spec.clear
+        wrapper.peek = peek
+        return wrapper
+    return decorator
+
+def build_many(jobs: dict[str, tuple]) -> dict:
+    """
+    Build the independent charts of a layout concurrently.
+    jobs: {name: (builder, *args)}, in layout order; the results come back in
+    the same order, so page latency follows the slowest chart.
+    """
+    return run_threads(jobs)
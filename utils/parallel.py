@@ -0,0 +1,37 @@
+"""
+Concurrency helpers for the Dashboard: fan independent loads and chart
+builds out to threads, keeping the Streamlit session context.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# Standard library imports.
+from concurrent.futures import ThreadPoolExecutor
+
+# Streamlit import
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# ------------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------------
+
+def run_threads(jobs: dict[str, tuple]) -> dict:
+    """
+    Run independent calls concurrently, one thread per job.
+    jobs: {name: (fn, *args)}
+    Returns {name: result} in the order of `jobs`, so callers can render in
+    layout order; the first error is raised once every job has finished.
+    """
+    if len(jobs) == 1:
+        ((name, (fn, *args)),) = jobs.items()
+        return {name: fn(*args)}
+    # Workers inherit the session context so cache spinners keep working
+    ctx = get_script_run_ctx(suppress_warning=True)
+    init = dict(initializer=add_script_run_ctx, initargs=(None, ctx)) if ctx is not None else {}
+    with ThreadPoolExecutor(max_workers=len(jobs), **init) as pool:
+        futures = {
+            name: pool.submit(fn, *args)
+            for name, (fn, *args) in jobs.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
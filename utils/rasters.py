@@ -0,0 +1,141 @@
+"""
+Raster store: interpolated grids written once in a quantized format and read
+back memory-mapped, so every session and process shares the same pages.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# Standard library imports.
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# --------------------
+# Third Party Imports
+# --------------------
+import numpy as np
+
+from utils.data import DB_PATH
+from utils.revisions import is_commit
+
+# ------------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------------
+
+# One directory per combination of source commits
+RASTER_DIR = DB_PATH.parent / "rasters"
+
+# Grid values are stored as uint16 codes on a linear scale; the last code
+# marks missing values
+CODE_DTYPE = np.uint16
+NAN_CODE = np.iinfo(CODE_DTYPE).max
+
+# ------------------------------------------------------------------------------
+# Rasters
+# ------------------------------------------------------------------------------
+
+class QuantizedRaster:
+    """
+    Grid of uint16 codes with the linear scale that maps them back to values
+    (value = offset + code * scale). `codes` is read-only, usually a memmap.
+    meta: bounds [lon min, lat min, lon max, lat max], shape and parameters
+    """
+
+    def __init__(self, codes: np.ndarray, offset: float, scale: float, meta: dict):
+        self.codes = codes
+        self.offset = offset
+        self.scale = scale
+        self.meta = meta
+
+    @classmethod
+    def quantize(cls, z: np.ndarray, meta: dict) -> QuantizedRaster:
+        finite = np.isfinite(z)
+        lo = float(z[finite].min()) if finite.any() else 0.0
+        hi = float(z[finite].max()) if finite.any() else 0.0
+        scale = (hi - lo) / (NAN_CODE - 1) or 1.0
+        codes = np.full(z.shape, NAN_CODE, dtype=CODE_DTYPE)
+        codes[finite] = np.rint((z[finite] - lo) / scale)
+        codes.setflags(write=False)
+        return cls(codes, lo, scale, meta)
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes)
+
+    def values(self, mask: np.ndarray | None = None) -> np.ndarray:
+        """Float values, optionally only at the flat `mask` (decodes less)."""
+        codes = np.asarray(self.codes) if mask is None else np.asarray(self.codes).ravel()[mask]
+        z = self.offset + codes * self.scale
+        z[codes == NAN_CODE] = np.nan
+        return z
+
+class RasterStore:
+    """
+    Directory of quantized rasters. A raster is a `.npy` of codes plus a
+    `.json` of scale and metadata; the json is written last, so a raster is
+    only visible once complete. Keys include the commits of the sources:
+    rasters computed from a branch are not stored.
+    """
+
+    def __init__(self, root: Path = RASTER_DIR):
+        self.root = Path(root)
+
+    def _paths(self, commits: tuple[str, ...], params: dict) -> tuple[Path, Path]:
+        folder = self.root / "-".join(c[:12] for c in commits)
+        digest = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        return folder / f"{digest}.npy", folder / f"{digest}.json"
+
+    def get(self, commits: tuple[str, ...], params: dict) -> QuantizedRaster | None:
+        if not all(is_commit(c) for c in commits):
+            return None
+        npy, meta_path = self._paths(commits, params)
+        try:
+            info = json.loads(meta_path.read_text())
+            codes = np.load(npy, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return QuantizedRaster(codes, info["offset"], info["scale"], info["meta"])
+
+    def put(self, commits: tuple[str, ...], params: dict, raster: QuantizedRaster) -> None:
+        if not all(is_commit(c) for c in commits):
+            return
+        npy, meta_path = self._paths(commits, params)
+        if not npy.parent.exists():
+            self._drop_other_commits(npy.parent)
+        npy.parent.mkdir(parents=True, exist_ok=True)
+        info = {"offset": raster.offset, "scale": raster.scale, "meta": raster.meta}
+        # Atomic renames: readers in other processes never see a partial file
+        for path, write in (
+            (npy, lambda f: np.save(f, np.ascontiguousarray(raster.codes))),
+            (meta_path, lambda f: f.write(json.dumps(info).encode())),
+        ):
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+
+    def _drop_other_commits(self, keep: Path) -> None:
+        # A newer commit of the sources supersedes the older rasters; open
+        # memmaps stay valid after the files are unlinked
+        if self.root.exists():
+            for folder in self.root.iterdir():
+                if folder != keep and folder.is_dir():
+                    shutil.rmtree(folder, ignore_errors=True)
+
+_store = RasterStore()
+
+def raster_store() -> RasterStore:
+    return _store
+
+def set_raster_store(store: RasterStore) -> None:
+    """Swap the raster store (e.g. a temporary directory in tests)."""
+    global _store
+    _store = store
@@ -0,0 +1,734 @@
+"""
+Reportes de agua: aggregated tables and interpolated rasters shared by the
+reportes page and the background warm-up.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# Standard library imports.
+import functools
+import inspect
+
+# --------------------
+# Third Party Imports
+# --------------------
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import shapely
+from scipy.spatial import cKDTree
+from shapely.geometry import MultiPolygon, Polygon
+
+from utils.cache import cached
+from utils.data import DATASETS, REPO_ID, load_report_counts, pins, shared_dataset, to_frame
+from utils.figures import cached_figure
+from utils.parallel import run_threads
+from utils.rasters import QuantizedRaster, raster_store
+from utils.spatial import bin_points, idw_from_neighbours, idw_loo_errors, kde_fft, make_grid
+
+# ------------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------------
+
+REPORTES_FILE = "reportes/part-0.parquet"
+HABCONS_FILE = DATASETS["habCons"]["filename"]
+
+# Cells per axis of the interpolation grid
+GRID_SIZE = 200
+
+# Cells per axis of the quick preview shown while the full grid is built
+PREVIEW_GRID_SIZE = 50
+
+# Nodes per interpolation mode: IDW on every node, or an FFT kernel density
+# of the reports
+GRID_SIZES = {
+    "uniform": GRID_SIZE,
+    "kde": GRID_SIZE,
+}
+
+# Standard deviation of the density kernel, in degrees (~1 km)
+KDE_BANDWIDTH = 0.01
+
+# (power, k) every KDE result is keyed on: the density ignores them, so all
+# the maps share one surface whatever IDW parameters they were asked with
+KDE_IDW = (0.0, 0)
+
+# Maps shown in the page: (year, metric, IDW power, k neighbours)
+REPORT_MAPS = (
+    (2022, "falta_agua_count", 0.7, 200),
+    (2024, "falta_agua_count", 0.8, 40),
+)
+
+# Report locations per STRtree query of the colonia join
+JOIN_BATCH = 50_000
+
+# Cells along the longer side of the raw report histogram, at any zoom
+HISTOGRAM_BINS = 300
+
+# Bump when the surfaces change for the same parameters, so the rasters
+# already in the store are computed again
+RASTER_VERSION = 2
+
+# Levels of the quantized animation frames (uint8 codes)
+FRAME_LEVELS = 255
+
+# IDW (power, k) of the maps picked freely in the page
+EXPLORER_IDW = (0.8, 40)
+
+# Candidate IDW parameters for the leave-one-out tuning
+TUNING_POWERS = (0.5, 0.6, 0.7, 0.8, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0)
+TUNING_KS = (5, 10, 20, 40, 80, 120, 200)
+
+# Report type behind each named metric; every other type is "otro_count"
+METRIC_TYPES = {
+    "falta_agua_count": "Falta de agua",
+    "fuga_count": "Fuga",
+}
+
+# Map titles per metric
+METRIC_LABELS = {
+    "falta_agua_count": "falta de agua",
+    "fuga_count": "fugas",
+    "otro_count": "otros problemas",
+}
+
+# ------------------------------------------------------------------------------
+# Report cube
+# ------------------------------------------------------------------------------
+
+class ReportCube:
+    """
+    Report counts as a dense (year, location, report type) array with
+    integer-coded dimensions. A location is one distinct coordinate of the
+    source, interned by the loader; `xy` holds the [lon, lat] of each id.
+    Every array is read-only: the cube is shared by every session.
+    """
+
+    def __init__(self, locations: pd.DataFrame, counts: pd.DataFrame):
+        year_codes, self.years = pd.factorize(counts["year"], sort=True)
+        type_codes, self.types = pd.factorize(counts["reporte"], sort=True)
+        self.xy = locations[["longitud", "latitud"]].to_numpy(dtype=float)
+        # Plain dict: the lookup table of a pandas Index is built lazily on
+        # the first get_loc, which is not safe from concurrent threads
+        self._year_positions = {int(year): i for i, year in enumerate(self.years)}
+
+        cube = np.zeros((len(self.years), len(self.xy), len(self.types)), dtype=np.int64)
+        np.add.at(cube, (year_codes, counts["location_id"].to_numpy(), type_codes),
+                  counts["report_count"].to_numpy())
+        # Smallest unsigned type that holds the largest count
+        self.counts = cube.astype(np.min_scalar_type(cube.max(initial=0)))
+
+        for array in (self.xy, self.counts):
+            array.setflags(write=False)
+
+    @property
+    def nbytes(self) -> int:
+        return self.xy.nbytes + self.counts.nbytes
+
+    def year_index(self, year: int) -> int:
+        """Position of a year along the first axis of `counts`."""
+        try:
+            return self._year_positions[int(year)]
+        except KeyError:
+            raise KeyError(year) from None
+
+    def type_mask(self, metric: str) -> np.ndarray:
+        """Report types that make up a metric of METRIC_LABELS."""
+        if metric not in METRIC_LABELS:
+            raise ValueError(f"Unknown report metric: {metric!r}")
+        named = self.types.isin(list(METRIC_TYPES.values()))
+        if metric == "otro_count":
+            return ~named
+        return self.types == METRIC_TYPES[metric]
+
+    def metric(self, metric: str, year: int | None = None) -> np.ndarray:
+        """Counts of a metric per (year, location), or per location for one year."""
+        counts = self.counts if year is None else self.counts[self.year_index(year)]
+        return counts[..., self.type_mask(metric)].sum(axis=-1)
+
+    def points(self, year: int, metric: str):
+        """
+        [lon, lat] and metric count of every location with any report in the
+        year (zero where it had only other report types).
+        """
+        counts = self.counts[self.year_index(year)]
+        reported = self.reported(year)
+        values = counts[reported][:, self.type_mask(metric)].sum(axis=1)
+        return self.xy[reported], values
+
+    def reported(self, year: int) -> np.ndarray:
+        """Locations with any report in the year: the known points of every metric."""
+        return self.counts[self.year_index(year)].sum(axis=1) > 0
+
+@cached(max_entries=4, pin=pins(REPORTES_FILE), show_spinner="Agregando reportes de agua…")
+def report_cube(revision: str = "main") -> ReportCube:
+    """Count cube of the reportes dataset, built once per commit."""
+    locations, counts = load_report_counts(REPO_ID, REPORTES_FILE, revision)
+    return ReportCube(to_frame(locations), to_frame(counts))
+
+# ------------------------------------------------------------------------------
+# Colonias
+# ------------------------------------------------------------------------------
+
+@cached(max_entries=4, pin=pins(REPORTES_FILE, HABCONS_FILE), show_spinner="Asignando reportes a colonias…")
+def report_colonia_rows(revision: str = "main") -> np.ndarray:
+    """
+    Row of habCons whose polygon contains each location of the cube (-1 when
+    outside every colonia). The free-text colonia of the reports is not used:
+    the join is by coordinates, with an STRtree queried in batches.
+    """
+    xy = report_cube(revision=revision).xy
+    habCons = shared_dataset("habCons", revision)
+    tree = shapely.STRtree(habCons.geometry.values)
+    rows = np.full(len(xy), -1, dtype=np.int32)
+    for start in range(0, len(xy), JOIN_BATCH):
+        points = shapely.points(xy[start:start + JOIN_BATCH])
+        point_idx, poly_idx = tree.query(points, predicate="intersects")
+        # Points on a shared border: the colonia of the lowest habCons row wins
+        order = np.lexsort((poly_idx, point_idx))
+        first_point, first = np.unique(point_idx[order], return_index=True)
+        rows[start + first_point] = poly_idx[order][first]
+    rows.setflags(write=False)
+    return rows
+
+@cached(max_entries=16, pin=pins(REPORTES_FILE, HABCONS_FILE))
+def colonia_reports(year: int, metric: str, revision: str = "main") -> pd.DataFrame:
+    """
+    Reports of one metric and year per habCons colonia (cve_col), with the
+    rate per 1,000 households. Ready to merge with other colonia tables.
+    """
+    habCons = shared_dataset("habCons", revision)
+    rows = report_colonia_rows(revision=revision)
+    counts = report_cube(revision=revision).metric(metric, year)
+    inside = rows >= 0
+    reportes = np.bincount(rows[inside], weights=counts[inside], minlength=len(habCons))
+    hogares = habCons["Sum_TotHog"].to_numpy(dtype=float)
+    return pd.DataFrame({
+        "cve_col": habCons["cve_col"].to_numpy(),
+        "alcaldia": habCons["alcaldia"].to_numpy(),
+        "colonia": habCons["colonia"].to_numpy(),
+        "reportes": reportes.astype(np.int64),
+        "hogares": hogares,
+        "tasa": np.divide(1000 * reportes, hogares, out=np.full(len(hogares), np.nan), where=hogares > 0),
+    })
+
+@cached_figure("reportes", "colonias", sources=(REPORTES_FILE, HABCONS_FILE), max_entries=32)
+def colonia_report_map(year: int, metric: str, revision: str = "main"):
+    """Choropleth of the report rate per 1,000 households of every colonia."""
+    habCons = shared_dataset("habCons", revision)
+    rates = habCons[["geometry"]].assign(**colonia_reports(year, metric, revision=revision))
+    fig = px.choropleth_mapbox(
+        rates,
+        geojson=rates.__geo_interface__,
+        locations=rates.index,
+        color="tasa",
+        color_continuous_scale="Viridis",
+        range_color=(0, np.nanpercentile(rates["tasa"], 98) if rates["tasa"].notna().any() else 1),
+        hover_name="colonia",
+        hover_data={"alcaldia": True, "reportes": True, "hogares": ":,.0f", "tasa": ":.2f"},
+        mapbox_style="carto-positron",
+        zoom=9.75,
+        center={"lat": 19.36, "lon": -99.1333},
+        opacity=0.75,
+        labels={"tasa": "Reportes por 1,000 hogares", "reportes": "Reportes", "hogares": "Hogares"},
+    )
+    fig.update_traces(marker_line_width=0.5, marker_line_color="white")
+    fig.update_layout(
+        title=dict(text=f"Reportes de {METRIC_LABELS[metric]} por colonia - {year}",
+                   x=0.02, xanchor='left', y=0.98),
+        margin=dict(l=0, r=0, t=50, b=0),
+        height=700,
+    )
+    return fig
+
+# ------------------------------------------------------------------------------
+# Rasters and maps
+# ------------------------------------------------------------------------------
+
+@cached(max_entries=8, pin=pins(HABCONS_FILE))
+def report_grid(n: int, revision: str = "main"):
+    """General grid to interpolate over, covering the CDMX colonias."""
+    habCons = shared_dataset("habCons", revision)
+    return make_grid(habCons.total_bounds, n)
+
+@cached(max_entries=8, pin=pins(HABCONS_FILE))
+def report_mask(n: int, revision: str = "main") -> np.ndarray:
+    """Flat boolean mask of the grid nodes inside CDMX."""
+    grid_lon_mesh, grid_lat_mesh, _ = report_grid(n, revision=revision)
+    habCons = shared_dataset("habCons", revision)
+    nodes = gpd.GeoSeries(
+        gpd.points_from_xy(grid_lon_mesh.ravel(), grid_lat_mesh.ravel()),
+        crs="EPSG:4326",
+    )
+    # Efficient spatial mask (predicates need shapely>=2)
+    mask = nodes.within(habCons.unary_union).to_numpy()
+    mask.setflags(write=False)
+    return mask
+
+@cached(max_entries=8, pin=pins(REPORTES_FILE))
+def report_tree(year: int, revision: str = "main") -> cKDTree:
+    """
+    KD-tree over the locations reported in a year, in the order of
+    ReportCube.points: the known points are the same for every metric, so
+    one tree serves every metric, mode and IDW parameter of the year.
+    """
+    cube = report_cube(revision=revision)
+    return cKDTree(cube.xy[cube.reported(year)])
+
+@cached(max_entries=4, pin=pins(REPORTES_FILE, HABCONS_FILE), show_spinner="Buscando vecinos…")
+def report_neighbours(year: int, k: int, n: int, revision: str = "main"):
+    """
+    k nearest known points of every grid node for one year, as float32
+    distances and int32 indices (n*n, k): uniform IDW of any metric or
+    power is then only a weighted mean.
+    Entries are large (8*n*n*k bytes: 64 MB at k=200 on the 200x200 grid),
+    so only a few are kept; the rasters themselves stay in the raster store.
+    """
+    _, _, grid_points = report_grid(n, revision=revision)
+    tree = report_tree(year, revision=revision)
+    # Years with fewer reported locations than k use them all (cKDTree pads
+    # missing neighbours with index n, out of range)
+    dists, idxs = tree.query(grid_points, k=min(k, tree.n))
+    return dists.astype(np.float32), idxs.astype(np.int32)
+
+def _kde_ignores_idw(func):
+    """
+    Replace `power` and `k` by KDE_IDW when mode is "kde", before the cached
+    function builds its key (peek included).
+    """
+    signature = inspect.signature(func)
+
+    def normalise(args, kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if bound.arguments["mode"] == "kde":
+            bound.arguments["power"], bound.arguments["k"] = KDE_IDW
+        return bound.args, bound.kwargs
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        args, kwargs = normalise(args, kwargs)
+        return func(*args, **kwargs)
+
+    def peek(*args, **kwargs):
+        args, kwargs = normalise(args, kwargs)
+        return func.peek(*args, **kwargs)
+
+    wrapper.peek = peek
+    return wrapper
+
+@_kde_ignores_idw
+@cached(max_entries=32, pin=pins(REPORTES_FILE, HABCONS_FILE), show_spinner="Interpolando reportes…")
+def report_raster(year: int, metric: str, power: float, k: int, n: int,
+                  mode: str = "uniform", revision: str = "main") -> QuantizedRaster:
+    """
+    Surface of one report metric for one year, shaped as the grid.
+    mode: "uniform" evaluates IDW on every node, "kde" is a Gaussian kernel
+    density of the reports (power and k are not used).
+    Surfaces are kept quantized in the raster store (utils.rasters), so other
+    processes and restarts map the file instead of interpolating again.
+    """
+    if mode not in GRID_SIZES:
+        raise ValueError(f"Unknown interpolation mode: {mode!r}")
+    commits = pins(REPORTES_FILE, HABCONS_FILE)(revision)
+    params = dict(version=RASTER_VERSION, year=int(year), metric=metric,
+                  power=float(power), k=int(k), n=int(n), mode=mode)
+    raster = raster_store().get(commits, params)
+    if raster is None:
+        grid_lon_mesh, grid_lat_mesh, _ = report_grid(n, revision=revision)
+        bounds = [grid_lon_mesh[0, 0], grid_lat_mesh[0, 0], grid_lon_mesh[0, -1], grid_lat_mesh[-1, 0]]
+        z = _interpolate(year, metric, power, k, n, mode, revision)
+        raster = QuantizedRaster.quantize(z, meta=dict(params, bounds=[float(b) for b in bounds],
+                                                       shape=list(z.shape)))
+        raster_store().put(commits, params, raster)
+    return raster
+
+def _interpolate(year: int, metric: str, power: float, k: int, n: int,
+                 mode: str, revision: str) -> np.ndarray:
+    # Known points
+    xy_known, z_known = report_cube(revision=revision).points(year, metric)
+    grid_lon_mesh, grid_lat_mesh, _ = report_grid(n, revision=revision)
+
+    if mode == "kde":
+        return kde_fft(xy_known, z_known, grid_lon_mesh[0], grid_lat_mesh[:, 0],
+                       bandwidth=KDE_BANDWIDTH)
+    dists, idxs = report_neighbours(year, k, n, revision=revision)
+    z_idw_flat = idw_from_neighbours(dists, idxs, z_known, power=power)
+    return z_idw_flat.reshape(grid_lat_mesh.shape)
+
+@cached(max_entries=16, pin=pins(REPORTES_FILE), show_spinner="Evaluando parámetros IDW…")
+def tune_idw(year: int, metric: str, revision: str = "main") -> pd.DataFrame:
+    """
+    Leave-one-out RMSE of IDW for every (power, k) in TUNING_POWERS x
+    TUNING_KS over one year's reports, best first.
+    """
+    xy_known, z_known = report_cube(revision=revision).points(year, metric)
+    errors = idw_loo_errors(xy_known, z_known, TUNING_POWERS, TUNING_KS,
+                            tree=report_tree(year, revision=revision))
+    rmse = pd.DataFrame(errors,
+                        index=pd.Index(TUNING_POWERS, name="power"),
+                        columns=pd.Index(TUNING_KS, name="k"))
+    return rmse.stack().rename("rmse").reset_index().sort_values("rmse", ignore_index=True)
+
+@_kde_ignores_idw
+@cached_figure("reportes", "mapa_idw", sources=(REPORTES_FILE, HABCONS_FILE), max_entries=32)
+def report_map(year: int, metric: str, power: float, k: int, n: int,
+               mode: str = "uniform", revision: str = "main"):
+    """Raster of one metric and year, masked to CDMX with colonia outlines."""
+    z_idw = report_raster(year, metric, power, k, n, mode, revision=revision).values()
+    return _raster_figure(
+        z_idw, n, revision,
+        title=f"Zonas con más reportes de {METRIC_LABELS[metric]} - {year}",
+        name='KDE' if mode == "kde" else 'IDW',
+    )
+
+@_kde_ignores_idw
+@cached_figure("reportes", "mapa_cambio", sources=(REPORTES_FILE, HABCONS_FILE), max_entries=32)
+def report_change_map(year_a: int, year_b: int, metric: str, power: float, k: int, n: int,
+                      mode: str = "uniform", kind: str = "difference", revision: str = "main"):
+    """
+    Change of one metric from year_a to year_b, from the two cached rasters
+    (same grid and parameters). kind: "difference" (b - a) or "ratio"
+    (log2 of b / a). Diverging scale centred on no change.
+    """
+    z_a = report_raster(year_a, metric, power, k, n, mode, revision=revision).values()
+    z_b = report_raster(year_b, metric, power, k, n, mode, revision=revision).values()
+    if kind == "difference":
+        z_change = z_b - z_a
+        colorbar_title = f"Cambio ({year_b} − {year_a})"
+    elif kind == "ratio":
+        # Small floor so areas without reports in one year stay finite
+        eps = 0.01 * max(np.nanmax(z_a), np.nanmax(z_b), 1e-12)
+        z_change = np.log2((z_b + eps) / (z_a + eps))
+        colorbar_title = f"log₂ ({year_b} / {year_a})"
+    else:
+        raise ValueError(f"Unknown change kind: {kind!r}")
+    return _raster_figure(
+        z_change, n, revision,
+        title=f"Cambio en reportes de {METRIC_LABELS[metric]}: {year_a} → {year_b}",
+        name=kind,
+        colorscale='RdBu_r',
+        colorbar_title=colorbar_title,
+        symmetric=True,
+    )
+
+@_kde_ignores_idw
+@cached(max_entries=8, pin=pins(REPORTES_FILE, HABCONS_FILE), show_spinner="Interpolando todos los años…")
+def report_frames(metric: str, power: float, k: int, n: int,
+                  mode: str = "uniform", revision: str = "main"):
+    """
+    Surfaces of one metric for every year of the cube, as a batch: the years
+    are interpolated concurrently (cached rasters are reused), masked to CDMX
+    and quantized to uint8 on one shared range.
+    Returns (years, codes, (vmin, vmax)); codes is years x nodes inside the mask
+    and a code c stands for vmin + c * (vmax - vmin) / FRAME_LEVELS.
+    """
+    years = report_cube(revision=revision).years.to_numpy()
+    mask = report_mask(n, revision=revision)
+    rasters = run_threads({
+        int(year): (report_raster, int(year), metric, power, k, n, mode, revision)
+        for year in years
+    })
+    values = np.stack([raster.values(mask) for raster in rasters.values()])
+
+    # Same robust range as the single maps, shared by every year
+    vmin, vmax = np.nanpercentile(values, [2, 98])
+    scale = FRAME_LEVELS / max(vmax - vmin, 1e-12)
+    codes = np.rint((np.clip(np.nan_to_num(values, nan=vmin), vmin, vmax) - vmin) * scale).astype(np.uint8)
+    codes.setflags(write=False)
+    return years, codes, (float(vmin), float(vmax))
+
+@_kde_ignores_idw
+@cached_figure("reportes", "animacion", sources=(REPORTES_FILE, HABCONS_FILE), max_entries=8)
+def report_animation(metric: str, power: float, k: int, n: int,
+                     mode: str = "uniform", revision: str = "main"):
+    """
+    Every year of one metric on a single map, with a year slider and play
+    button. The grid, mask and outlines are sent once; each frame only
+    replaces the uint8 colour codes of the raster trace.
+    """
+    years, codes, (vmin, vmax) = report_frames(metric, power, k, n, mode, revision=revision)
+    fig = _raster_figure(
+        np.zeros(report_mask(n, revision=revision).shape), n, revision,
+        title=f"Zonas con más reportes de {METRIC_LABELS[metric]} por año",
+        name='KDE' if mode == "kde" else 'IDW',
+    )
+
+    # Raster trace: codes on a fixed 0-255 scale, labelled with real values
+    ticks = np.linspace(0, FRAME_LEVELS, 6)
+    fig.update_traces(
+        selector=0,
+        marker=dict(
+            color=codes[-1],
+            cmin=0,
+            cmax=FRAME_LEVELS,
+            colorbar=dict(tickvals=ticks, ticktext=[f"{vmin + t * (vmax - vmin) / FRAME_LEVELS:.2f}" for t in ticks]),
+        ),
+        hovertemplate=(
+            "Nivel: %{marker.color}/" f"{FRAME_LEVELS}<br>"
+            "Lon: %{x:.5f}<br>"
+            "Lat: %{y:.5f}<extra></extra>"
+        ),
+    )
+    fig.frames = [
+        go.Frame(name=str(year), data=[go.Scattergl(marker=dict(color=frame))], traces=[0])
+        for year, frame in zip(years, codes)
+    ]
+
+    def _step(year):
+        return dict(method="animate", label=str(year),
+                    args=[[str(year)], dict(mode="immediate", frame=dict(duration=0, redraw=True))])
+
+    fig.update_layout(
+        sliders=[dict(
+            active=len(years) - 1,
+            currentvalue=dict(prefix="Año: "),
+            pad=dict(t=30),
+            steps=[_step(year) for year in years],
+        )],
+        updatemenus=[dict(
+            type="buttons",
+            direction="left",
+            x=0.02, xanchor="left", y=0, yanchor="top",
+            pad=dict(t=30, r=10),
+            buttons=[
+                dict(label="▶", method="animate",
+                     args=[None, dict(frame=dict(duration=800, redraw=True), fromcurrent=True)]),
+                dict(label="⏸", method="animate",
+                     args=[[None], dict(mode="immediate", frame=dict(duration=0, redraw=False))]),
+            ],
+        )],
+    )
+    return fig
+
+def report_extent(revision: str = "main") -> tuple[float, float, float, float]:
+    """(minx, miny, maxx, maxy) of the CDMX colonias, the unzoomed view."""
+    return tuple(float(b) for b in shared_dataset("habCons", revision).total_bounds)
+
+@cached(max_entries=64, pin=pins(REPORTES_FILE))
+def report_histogram(year: int, metric: str, bounds: tuple[float, float, float, float],
+                     bins: int = HISTOGRAM_BINS, revision: str = "main"):
+    """
+    Every report of one metric and year binned over `bounds`: each location
+    of the cube weighs its count, so the histogram is that of the raw points.
+    Returns the (ny, nx) counts and the lon and lat edges.
+    """
+    xy, counts = report_cube(revision=revision).points(year, metric)
+    return bin_points(xy, counts, bounds, bins)
+
+@cached_figure("reportes", "puntos", sources=(REPORTES_FILE, HABCONS_FILE), max_entries=64)
+def report_points_map(year: int, metric: str, bounds: tuple[float, float, float, float],
+                      revision: str = "main"):
+    """
+    Density image of the raw reports at the current extent (log scale), binned
+    on the server so the browser only receives the image.
+    """
+    counts, lon_edges, lat_edges = report_histogram(year, metric, bounds, revision=revision)
+    with np.errstate(divide="ignore"):
+        z = np.where(counts > 0, np.log10(counts), np.nan)  # empty cells stay transparent
+    top = int(np.ceil(np.nanmax(z))) if np.isfinite(z).any() else 1
+    ticks = list(range(0, max(top, 1) + 1))
+
+    fig = go.Figure()
+    fig.add_trace(go.Heatmap(
+        x=(lon_edges[:-1] + lon_edges[1:]) / 2,
+        y=(lat_edges[:-1] + lat_edges[1:]) / 2,
+        z=z,
+        customdata=counts.astype(int),
+        colorscale='Viridis',
+        zmin=0,
+        zmax=max(top, 1),
+        colorbar=dict(
+            title='Reportes por celda',
+            titleside='right',
+            thickness=14,
+            len=0.8,
+            tickvals=ticks,
+            ticktext=[f"{10**t:,}" for t in ticks],
+        ),
+        hovertemplate=(
+            "Reportes: %{customdata}<br>"
+            "Lon: %{x:.5f}<br>"
+            "Lat: %{y:.5f}<extra></extra>"
+        ),
+        name='Reportes',
+    ))
+
+    # CDMX boundary as one trace (None separates the rings)
+    lon, lat = _outline_xy(shared_dataset("habCons", revision).unary_union)
+    fig.add_trace(go.Scatter(
+        x=lon, y=lat,
+        mode='lines',
+        line=dict(color='rgba(0,0,0,0.75)', width=1),
+        hoverinfo='skip',
+        showlegend=False,
+    ))
+    # Invisible corners: heatmaps are not selectable, this keeps box select on
+    minx, miny, maxx, maxy = bounds
+    fig.add_trace(go.Scatter(
+        x=[minx, maxx], y=[miny, maxy],
+        mode='markers',
+        marker=dict(opacity=0),
+        hoverinfo='skip',
+        showlegend=False,
+    ))
+
+    fig.update_layout(
+        title=dict(
+            text=f"Reportes de {METRIC_LABELS[metric]} - {year} (selecciona un área para acercar)",
+            x=0.02, xanchor='left', y=0.98
+        ),
+        height=800,
+        margin=dict(l=10, r=10, t=50, b=10),
+        dragmode='select',
+    )
+    fig.update_xaxes(title_text='Longitude', range=[minx, maxx], zeroline=False)
+    fig.update_yaxes(title_text='Latitude', range=[miny, maxy],
+                     scaleanchor='x', scaleratio=1, zeroline=False)
+    return fig
+
+def _outline_xy(geometry):
+    # Exterior rings of a Polygon/MultiPolygon as coordinate lists
+    polygons = geometry.geoms if isinstance(geometry, MultiPolygon) else [geometry]
+    lon, lat = [], []
+    for poly in polygons:
+        x, y = poly.exterior.xy
+        lon += list(x) + [None]
+        lat += list(y) + [None]
+    return lon, lat
+
+def _raster_figure(z_idw, n: int, revision: str, title: str, name: str,
+                   colorscale: str = 'Viridis', colorbar_title: str = 'Interpolated intensity',
+                   symmetric: bool = False):
+    # symmetric: colour range centred on 0, shared by both signs
+    grid_lon_mesh, grid_lat_mesh, grid_points = report_grid(n, revision=revision)
+
+    # For mexico city map (neighborhoods included)
+    habCons = shared_dataset("habCons", revision)
+    temp_copy = habCons[['geometry', 'alcaldia', 'colonia']]
+
+    # Ensure same CRS
+    if getattr(habCons, "crs", None) != "EPSG:4326":
+        habCons = habCons.to_crs("EPSG:4326")
+    if getattr(temp_copy, "crs", None) != "EPSG:4326":
+        temp_copy = temp_copy.to_crs("EPSG:4326")
+
+    # --- your existing interpolation result: z_idw, grid_lon_mesh, grid_lat_mesh ---
+
+    # Flatten the grid for plotting points (we’ll mask outside polygon early for speed)
+    grid_df = pd.DataFrame({
+        'lon': grid_lon_mesh.ravel(),
+        'lat': grid_lat_mesh.ravel(),
+        'value': z_idw.ravel()
+    })
+
+    # Polygon/MultiPolygon of CDMX, for the soft fill
+    cdmx_union = habCons.unary_union
+    mask_inside = report_mask(n, revision=revision)
+    grid_inside = grid_df[mask_inside].copy()
+
+    # Optional: smooth colorbar range with robust min/max (ignore outliers)
+    if symmetric:
+        vmax = np.nanpercentile(np.abs(grid_inside['value']), 98)
+        vmin = -vmax
+    else:
+        vmin = np.nanpercentile(grid_inside['value'], 2)
+        vmax = np.nanpercentile(grid_inside['value'], 98)
+
+    # --- figure ---
+    fig = go.Figure()
+
+    # 1) Raster points (use Scattergl for speed with many points)
+    fig.add_trace(go.Scattergl(
+        x=grid_inside['lon'],
+        y=grid_inside['lat'],
+        mode='markers',
+        marker=dict(
+            size=4 * GRID_SIZE / n,  # coarser grids get larger dots
+            opacity=0.9,
+            color=np.clip(grid_inside['value'], vmin, vmax),
+            colorscale=colorscale,  # Viridis is perceptually uniform
+            cmin=vmin,
+            cmax=vmax,
+            colorbar=dict(
+                title=colorbar_title,
+                titleside='right',
+                thickness=14,
+                len=0.8,
+                ticks='outside'
+            )
+        ),
+        hovertemplate=(
+            "Value: %{marker.color:.2f}<br>"
+            "Lon: %{x:.5f}<br>"
+            "Lat: %{y:.5f}<extra></extra>"
+        ),
+        showlegend=False,
+        name=name
+    ))
+
+    # 2) Add CDMX boundary (stroke)
+    def _add_poly_outline(geometry, line_color='black', line_width=0.8):
+        if isinstance(geometry, Polygon):
+            x, y = geometry.exterior.xy
+            fig.add_trace(go.Scatter(
+                x=list(x), y=list(y),
+                mode='lines',
+                line=dict(color=line_color, width=line_width),
+                showlegend=False,
+                hoverinfo='skip'
+            ))
+        elif isinstance(geometry, MultiPolygon):
+            for poly in geometry.geoms:
+                _add_poly_outline(poly, line_color=line_color, line_width=line_width)
+
+    # Outlines from your temp_copy geometries (alcaldías/colonias)
+    for geom in temp_copy['geometry']:
+        if geom is not None:
+            _add_poly_outline(geom, line_color='rgba(0,0,0,0.5)', line_width=0.6)
+
+    # 3) Soft fill for the whole CDMX union (nice focus effect)
+    def _add_poly_fill(geometry, fillcolor='rgba(0,0,0,0.05)'):
+        if isinstance(geometry, Polygon):
+            x, y = geometry.exterior.xy
+            fig.add_trace(go.Scatter(
+                x=list(x), y=list(y),
+                mode='lines',
+                fill='toself',
+                fillcolor=fillcolor,
+                line=dict(color='rgba(0,0,0,0.75)', width=1),
+                hoverinfo='skip',
+                showlegend=False
+            ))
+        elif isinstance(geometry, MultiPolygon):
+            for poly in geometry.geoms:
+                _add_poly_fill(poly, fillcolor=fillcolor)
+
+    _add_poly_fill(cdmx_union, fillcolor='rgba(0,0,0,0.04)')
+
+    # 4) Layout tweaks: equal aspect, subtle grid, margins, title
+    fig.update_layout(
+        title=dict(
+            text=title,
+            x=0.02, xanchor='left', y=0.98
+        ),
+        width=900, height=1000,
+        margin=dict(l=10, r=10, t=50, b=10),
+    )
+
+    # Equal aspect so geography isn’t distorted
+    fig.update_xaxes(
+        title_text='Longitude',
+        showgrid=True, gridcolor='rgba(0,0,0,0.08)',
+        zeroline=False
+    )
+    fig.update_yaxes(
+        title_text='Latitude',
+        showgrid=True, gridcolor='rgba(0,0,0,0.08)',
+        scaleanchor='x', scaleratio=1,
+        zeroline=False
+    )
+    return fig
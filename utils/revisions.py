@@ -0,0 +1,96 @@
+"""
+Dataset revisions: resolve a branch such as `main` to the commit that last
+touched each file, so every cache is keyed on what the data actually is.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# Standard library imports.
+import logging
+import re
+
+# --------------------
+# Third Party Imports
+# --------------------
+from huggingface_hub import HfApi
+
+from utils.cache import cached
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------------
+
+# Seconds between two metadata checks against the Hub (a single API call)
+METADATA_TTL = 5*60
+
+_COMMIT = re.compile(r"[0-9a-f]{40}")
+
+# ------------------------------------------------------------------------------
+# Metadata sources
+# ------------------------------------------------------------------------------
+
+class HubMetadata:
+    """Reads the last commit of every file of a dataset from the Hub."""
+
+    def file_revisions(self, repo_id: str, revision: str) -> dict[str, str]:
+        tree = HfApi().list_repo_tree(
+            repo_id,
+            repo_type="dataset",
+            revision=revision,
+            recursive=True,
+            expand=True,
+        )
+        return {
+            item.path: item.last_commit.oid
+            for item in tree
+            if getattr(item, "last_commit", None) is not None
+        }
+
+class LocalMetadata:
+    """
+    Stand-in metadata source (tests, offline runs).
+    revisions: {filename: commit}; unknown files keep the requested revision
+    """
+
+    def __init__(self, revisions: dict[str, str] | None = None):
+        self.revisions = dict(revisions or {})
+
+    def file_revisions(self, repo_id: str, revision: str) -> dict[str, str]:
+        return dict(self.revisions)
+
+_source = HubMetadata()
+
+def set_metadata_source(source) -> None:
+    """Swap the metadata source (e.g. a LocalMetadata in tests)."""
+    global _source
+    _source = source
+    _file_revisions.clear()
+
+# ------------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------------
+
+def is_commit(revision: str) -> bool:
+    return bool(_COMMIT.fullmatch(revision))
+
+@cached(ttl=METADATA_TTL, max_entries=4)
+def _file_revisions(repo_id: str, revision: str) -> dict[str, str]:
+    try:
+        return _source.file_revisions(repo_id, revision)
+    except Exception:
+        # Offline or rate limited: callers fall back to the branch name
+        logger.warning("Could not resolve %s@%s", repo_id, revision, exc_info=True)
+        return {}
+
+def resolve_revision(repo_id: str, filename: str, revision: str = "main") -> str:
+    """
+    Commit that last modified `filename` on `revision`. Files that did not
+    change keep their commit when others are updated, so only their caches
+    are invalidated. Commits are returned as is.
+    """
+    if is_commit(revision):
+        return revision
+    return _file_revisions(repo_id, revision).get(filename, revision)
@@ -0,0 +1,188 @@
+"""
+Rollups: consumption, inmuebles, IDU, density and report measures at city,
+alcaldía and colonia level in one indexed table, for drill-down views.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# --------------------
+# Third Party Imports
+# --------------------
+import pandas as pd
+import plotly.express as px
+
+from utils.cache import cached
+from utils.data import DATASETS, pins, shared_dataset
+from utils.figures import cached_figure
+from utils.reports import HABCONS_FILE, REPORTES_FILE, colonia_reports
+
+# ------------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------------
+
+CONSUMO_FILE = DATASETS["consumo19"]["filename"]
+DENSIDAD_FILE = DATASETS["densidadHogares"]["filename"]
+
+# Development index (IDU) classes of consumo19, in legend order
+IDU_LEVELS = ["ALTO", "MEDIO", "BAJO", "POPULAR"]
+
+# Grados of densidadHogares counted as high density
+HIGH_DENSITY = ("Alta concentración habitacional", "Muy alta concentración habitacional")
+
+# Report metrics per colonia and the column each one gets
+REPORT_COLUMNS = {
+    "falta_agua_count": "reportes_falta_agua",
+    "fuga_count": "reportes_fuga",
+    "otro_count": "reportes_otro",
+}
+
+# Measures offered by the drill-down, with their labels
+ROLLUP_MEASURES = {
+    "consumo_total": "Consumo total (m³)",
+    "consumo_por_inmueble": "Consumo por inmueble (m³)",
+    "total_inmuebles": "Total de inmuebles",
+    "pct_POPULAR": "Proporción de inmuebles con IDU popular",
+    "hogares": "Hogares",
+    "colonias_alta_densidad": "Colonias de alta densidad habitacional",
+    "reportes_falta_agua": "Reportes de falta de agua",
+    "reportes_por_mil_hogares": "Reportes de falta de agua por 1,000 hogares",
+}
+
+# Colonias shown per alcaldía in the drill-down chart
+DRILL_TOP = 30
+
+# ------------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------------
+
+@cached(max_entries=4, pin=pins(CONSUMO_FILE), name="consumo/colonias")
+def consumption_by_colonia(revision: str = "main"):
+    """Consumo and inmuebles per colonia (June 2019), largest first."""
+    dataConsumo19 = shared_dataset("consumo19", revision)
+
+    # Filtering using the provided bimester and date by user
+    consF = dataConsumo19[dataConsumo19['fecha_referencia'] == "2019-06-30"]
+
+    # Neighborhood aggregation
+    consWatAgg = consF.groupby(['colonia', 'alcaldia']).agg({
+        'consumo_total': 'sum',
+        'inmuebles_domesticos': 'sum',
+        'consumo_total_dom': 'sum',
+        'inmuebles_no_domesticos': 'sum',
+        'consumo_total_no_dom': 'sum',
+        'inmuebles_mixtos': 'sum',
+        'consumo_total_mixto': 'sum',
+        'total_inmuebles': 'sum'
+    }).reset_index()
+
+    # We filter out rows where all consumption values are zero
+    consWatAgg = consWatAgg[~(consWatAgg.iloc[:, 2:] == 0).all(axis=1)]
+
+    # insert a pivot and create new columns based on indice_des
+    shareIdxDev = consF.pivot_table(
+        index=['colonia', 'alcaldia'],
+        columns='indice_des',
+        values='total_inmuebles',
+        aggfunc='sum'
+    ).reset_index()
+
+    allAgg = consWatAgg.merge(shareIdxDev, on=['colonia', 'alcaldia'], how='left')
+    allAgg.fillna(0, inplace=True)
+    allAgg = allAgg.sort_values(by="consumo_total", ascending=False)
+    return allAgg
+
+@cached(max_entries=4, pin=pins(CONSUMO_FILE, DENSIDAD_FILE, HABCONS_FILE, REPORTES_FILE),
+        show_spinner="Agregando por alcaldía…")
+def rollup_table(year: int, revision: str = "main") -> pd.DataFrame:
+    """
+    Additive measures per colonia summed up to alcaldía and city, indexed by
+    (nivel, alcaldia, colonia) and sorted, so every view is an index lookup:
+    nivel is "ciudad", "alcaldia" or "colonia"; upper levels leave the
+    names below them empty. Shares and rates are derived on every row after
+    summing. Reports are those of `year`.
+    """
+    consumo = consumption_by_colonia(revision).reindex(
+        columns=["alcaldia", "colonia", "consumo_total", "total_inmuebles",
+                 "inmuebles_domesticos", "inmuebles_no_domesticos", "inmuebles_mixtos", *IDU_LEVELS],
+        fill_value=0,
+    )
+
+    # habCons, density and reports share the colonia key (cve_col)
+    habCons = shared_dataset("habCons", revision)
+    densidad = shared_dataset("densidadHogares", revision)
+    dense = densidad.loc[densidad["grado"].isin(HIGH_DENSITY), "cve_col"]
+    colonias = pd.DataFrame({
+        "alcaldia": habCons["alcaldia"].to_numpy(),
+        "colonia": habCons["colonia"].to_numpy(),
+        "hogares": pd.to_numeric(habCons["Sum_TotHog"], errors="coerce").fillna(0).to_numpy(),
+        "colonias_alta_densidad": habCons["cve_col"].isin(dense).astype(int).to_numpy(),
+    })
+    for metric, column in REPORT_COLUMNS.items():
+        # Rows follow habCons order
+        colonias[column] = colonia_reports(year, metric, revision=revision)["reportes"].to_numpy()
+    colonias = colonias.groupby(["alcaldia", "colonia"], as_index=False).sum()
+
+    # Consumo only knows colonia names: join on (alcaldia, colonia)
+    base = consumo.merge(colonias, on=["alcaldia", "colonia"], how="outer")
+    measures = [c for c in base.columns if c not in ("alcaldia", "colonia")]
+    base[measures] = base[measures].fillna(0)
+
+    alcaldias = base.groupby("alcaldia", as_index=False)[measures].sum().assign(colonia="")
+    city = base[measures].sum().to_frame().T.assign(alcaldia="", colonia="")
+    table = (
+        pd.concat([city.assign(nivel="ciudad"), alcaldias.assign(nivel="alcaldia"),
+                   base.assign(nivel="colonia")], ignore_index=True)
+        .set_index(["nivel", "alcaldia", "colonia"])
+        .sort_index()
+    )
+
+    # Shares and rates are not additive: derived per row after the rollup
+    idu_total = table[IDU_LEVELS].sum(axis=1)
+    for level in IDU_LEVELS:
+        table[f"pct_{level}"] = table[level] / idu_total.where(idu_total > 0)
+    table["consumo_por_inmueble"] = table["consumo_total"] / table["total_inmuebles"].where(table["total_inmuebles"] > 0)
+    table["reportes_por_mil_hogares"] = 1000 * table["reportes_falta_agua"] / table["hogares"].where(table["hogares"] > 0)
+    return table
+
+def rollup_row(table: pd.DataFrame, alcaldia: str = "") -> pd.Series:
+    """Totals of the city, or of one alcaldía."""
+    return table.loc[("alcaldia", alcaldia, "")] if alcaldia else table.loc[("ciudad", "", "")]
+
+def drill_down(table: pd.DataFrame, alcaldia: str = "") -> pd.DataFrame:
+    """Rows one level below: the alcaldías of the city, or the colonias of one alcaldía."""
+    if alcaldia:
+        return table.loc[("colonia", alcaldia)]
+    return table.loc["alcaldia"].droplevel("colonia")
+
+@cached_figure("consumo", "drill_down", sources=(CONSUMO_FILE, DENSIDAD_FILE, HABCONS_FILE, REPORTES_FILE),
+               max_entries=64)
+def rollup_bars(measure: str, year: int, alcaldia: str = "", revision: str = "main"):
+    """Bars of one measure per alcaldía, or per colonia of one alcaldía (top DRILL_TOP)."""
+    rows = drill_down(rollup_table(year, revision=revision), alcaldia)[measure].dropna()
+    rows = rows.sort_values(ascending=False)
+    if alcaldia:
+        rows = rows.head(DRILL_TOP)
+    level = "Colonia" if alcaldia else "Alcaldía"
+
+    fig = px.bar(
+        x=rows.index,
+        y=rows.to_numpy(),
+        labels={"x": level, "y": ROLLUP_MEASURES[measure]},
+        color=rows.to_numpy(),
+        color_continuous_scale="Blues",
+    )
+    fig.update_traces(
+        marker_line_width=0.6, marker_line_color="white",
+        hovertemplate=f"<b>%{{x}}</b><br>{ROLLUP_MEASURES[measure]}: %{{y:,.2f}}<extra></extra>",
+    )
+    title = (f"{ROLLUP_MEASURES[measure]} en {alcaldia} (Top {DRILL_TOP} colonias)" if alcaldia
+             else f"{ROLLUP_MEASURES[measure]} por alcaldía (haz clic en una barra para ver sus colonias)")
+    fig.update_layout(
+        title=dict(text=title, x=0.02, xanchor="left", font=dict(size=18)),
+        margin=dict(t=60, r=20, b=20, l=20),
+        coloraxis_showscale=False,
+        xaxis=dict(tickangle=-45),
+        height=520,
+    )
+    return fig
@@ -0,0 +1,118 @@
+"""
+Spatial helpers for the Dashboard: interpolation grids, IDW and kernel density.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# --------------------
+# Third Party Imports
+# --------------------
+import numpy as np
+from scipy.signal import fftconvolve
+from scipy.spatial import cKDTree
+
+# ------------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------------
+
+def make_grid(bounds, n: int = 200):
+    """
+    bounds: (minx, miny, maxx, maxy) of the area to cover
+    n: number of cells per axis
+    Returns the lon/lat meshes and the (n*n, 2) array of grid [lon, lat].
+    """
+    minx, miny, maxx, maxy = bounds
+    grid_lon = np.linspace(minx, maxx, n)
+    grid_lat = np.linspace(miny, maxy, n)
+
+    grid_lon_mesh, grid_lat_mesh = np.meshgrid(grid_lon, grid_lat)
+    grid_points = np.c_[grid_lon_mesh.ravel(), grid_lat_mesh.ravel()]
+    return grid_lon_mesh, grid_lat_mesh, grid_points
+
+def idw_from_neighbours(dists, idxs, values_known, power=2):
+    """
+    IDW from precomputed nearest neighbours: dists and idxs of shape (M, k)
+    as returned by cKDTree.query. The same neighbours serve any values over
+    the same known points and any power. The inputs are not modified.
+    """
+    dists = np.asarray(dists, dtype=float).reshape(len(dists), -1)
+    idxs = np.asarray(idxs).reshape(len(idxs), -1)
+    weights = 1 / np.maximum(dists, 1e-10)**power  # avoid division by zero
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    interpolated = np.sum(np.asarray(values_known)[idxs] * weights, axis=1)
+    return interpolated
+
+def kde_fft(xy_known, weights, grid_lon, grid_lat, bandwidth=0.01):
+    """
+    Gaussian kernel density of weighted points over the nodes of a regular
+    (len(grid_lat), len(grid_lon)) grid: points are binned to their nearest
+    node and the bins convolved with the kernel by FFT, O(G log G) whatever
+    the number of points or neighbours.
+    bandwidth: kernel standard deviation, in the grid's units (degrees)
+    Returns the smoothed weight per node (the kernel sums to 1).
+    """
+    dx = grid_lon[1] - grid_lon[0]
+    dy = grid_lat[1] - grid_lat[0]
+    # Bin edges halfway between nodes
+    edges_x = np.r_[grid_lon - dx / 2, grid_lon[-1] + dx / 2]
+    edges_y = np.r_[grid_lat - dy / 2, grid_lat[-1] + dy / 2]
+    binned, _, _ = np.histogram2d(xy_known[:, 1], xy_known[:, 0],
+                                  bins=(edges_y, edges_x), weights=weights)
+
+    # Separable kernel truncated at 4 standard deviations
+    sx, sy = bandwidth / dx, bandwidth / dy
+    kx = np.exp(-0.5 * (np.arange(-np.ceil(4 * sx), np.ceil(4 * sx) + 1) / sx)**2)
+    ky = np.exp(-0.5 * (np.arange(-np.ceil(4 * sy), np.ceil(4 * sy) + 1) / sy)**2)
+    kernel = np.outer(ky, kx)
+    kernel /= kernel.sum()
+    return fftconvolve(binned, kernel, mode="same")
+
+def idw_loo_errors(xy_known, values_known, powers, ks, tree=None):
+    """
+    Leave-one-out RMSE of IDW for every (power, k) pair, from one KD-tree
+    query at max(ks) + 1 neighbours: each point is predicted from the others
+    (its own nearest hit is dropped) and smaller k reuse the first columns.
+    Coordinates must be unique (as the report cube's locations are): a
+    duplicate could be returned before the point itself and leak its value.
+    tree: optional cKDTree already built over xy_known
+    Returns an array of shape (len(powers), len(ks)).
+    """
+    values_known = np.asarray(values_known, dtype=float)
+    k_max = min(max(ks), len(values_known) - 1)
+    tree = cKDTree(xy_known) if tree is None else tree
+    dists, idxs = tree.query(xy_known, k=k_max + 1)
+    # Column 0 is the point itself, the only hit at distance zero
+    dists, idxs = dists[:, 1:], idxs[:, 1:]
+    neighbours = values_known[idxs]
+
+    errors = np.empty((len(powers), len(ks)))
+    for i, power in enumerate(powers):
+        weights = 1 / dists**power
+        # Cumulative sums give the weighted mean for every k at once
+        num = np.cumsum(weights * neighbours, axis=1)
+        den = np.cumsum(weights, axis=1)
+        for j, k in enumerate(ks):
+            col = min(k, k_max) - 1
+            predicted = num[:, col] / den[:, col]
+            errors[i, j] = np.sqrt(np.mean((predicted - values_known)**2))
+    return errors
+
+def bin_points(xy, weights, bounds, bins: int = 400):
+    """
+    Weighted 2D histogram of points inside bounds (minx, miny, maxx, maxy),
+    with square cells: `bins` along the longer side.
+    Returns the (ny, nx) counts and the lon and lat bin edges.
+    """
+    minx, miny, maxx, maxy = bounds
+    cell = max(maxx - minx, maxy - miny) / bins
+    nx = max(1, int(np.ceil((maxx - minx) / cell)))
+    ny = max(1, int(np.ceil((maxy - miny) / cell)))
+    counts, lon_edges, lat_edges = np.histogram2d(
+        xy[:, 0], xy[:, 1], bins=(nx, ny),
+        range=((minx, minx + nx*cell), (miny, miny + ny*cell)),
+        weights=weights,
+    )
+    # histogram2d is indexed (x, y); images are (row = lat, column = lon)
+    return counts.T, lon_edges, lat_edges
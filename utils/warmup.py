@@ -0,0 +1,56 @@
+"""
+Background cache warm-up, started from the Intro page so the analysis pages
+find their datasets, rasters and figures already cached.
+Author: Daniel Malváez
+"""
+
+from __future__ import annotations
+
+# Standard library imports.
+import logging
+import threading
+
+# Streamlit import
+import streamlit as st
+
+from utils.data import DATASETS, REPO_ID, load_many, load_report_counts, shared_dataset
+from utils.figures import build_many
+from utils.reports import (EXPLORER_IDW, GRID_SIZE, GRID_SIZES, REPORT_MAPS, REPORTES_FILE, report_animation,
+                           report_cube, report_grid, report_map)
+from utils.rollups import rollup_table
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------------
+
+def _warm(revision: str) -> None:
+    # Same call shapes as the pages, otherwise the cache keys would differ
+    jobs = {name: (shared_dataset, name, revision) for name in DATASETS}
+    jobs["reportes"] = (load_report_counts, REPO_ID, REPORTES_FILE, revision)
+    load_many(jobs)
+    cube = report_cube(revision=revision)
+    # Drill-down of the consumption page (reports of the latest year)
+    rollup_table(int(cube.years[-1]), revision=revision)
+    report_grid(GRID_SIZE, revision=revision)
+    build_many({
+        params: (report_map, *params, GRID_SIZE, "uniform", revision)
+        for params in REPORT_MAPS
+    })
+    # Default playback of the reportes page (falta de agua, KDE)
+    report_animation("falta_agua_count", *EXPLORER_IDW, GRID_SIZES["kde"], "kde", revision)
+
+def _run(revision: str) -> None:
+    try:
+        _warm(revision)
+    except Exception:
+        # The pages will load on demand, warm-up is best effort
+        logger.exception("Cache warm-up failed")
+
+@st.cache_resource(show_spinner=False)
+def start_warmup(revision: str = "main") -> threading.Thread:
+    """Prefetch every page's data in a daemon thread, once per process."""
+    thread = threading.Thread(target=_run, args=(revision,), name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -11,6 +11,9 @@ import warnings
 import streamlit as st
 import pandas as pd
 
+from utils.cache import cached, show_cache_stats
+from utils.warmup import start_warmup
+
 # Configure warnings to keep the output clean.
 warnings.filterwarnings("ignore")
 
@@ -32,10 +35,12 @@ FACT_HIDR_COLOR = {
     "VERDE": "#10b981",
 }
 
-@st.cache_data(show_spinner=False)
+# Keyed on the frame's dataset token, so the frame itself is never hashed
+@cached(max_entries=32)
 def order_categorical(df: pd.DataFrame, col: str, order: list):
     if col in df.columns:
-        df[col] = pd.Categorical(df[col], categories=order, ordered=True)
+        # New frame: the input may be a shared dataset view
+        df = df.assign(**{col: pd.Categorical(df[col], categories=order, ordered=True)})
     return df
 
 # ------------------------------------------------------------------------------
@@ -55,6 +60,10 @@ def main() -> None:
         page_icon="🚰",  
         initial_sidebar_state="expanded"
     )
+
+    # Start loading every page's data while the user reads the intro
+    start_warmup()
+    show_cache_stats()
     
     # ---------------------------
     #        Styling